@@ -6,12 +6,16 @@ import time
 import threading
 import queue
 import processing_excel  # Make sure processing_excel.py is in the same folder
+import metrics
+import profiling
 
 start_time = 0
 timer_running = False
+idle_stats_text = "0.0 files/min · 0 rows/s | Queue: 0 waiting · 0 in flight"
 
 def start():
     global timer_running, start_time
+    metrics.reset()
     processing_excel.start_watcher()
     start_time = time.time()
     timer_running = True
@@ -25,16 +29,36 @@ def stop():
     processing_excel.clear_queue(processing_excel.preprocessing_queue)
     timer_running = False
     timer_label.config(text="Time: 00:00:00")
+    stats_label.config(text=idle_stats_text)
     status_label.config(text="Status: Stopped", fg="red")
     log("\n--- STOPPED ---\n")
 
+def toggle_profiling():
+    profiling.set_enabled(profile_var.get())
+    if profiling.enabled:
+        log(f"🔬 Profiling on, per-file profiles go to: {profiling.PROFILE_DIR}")
+    else:
+        log("🔬 Profiling off")
+
 def update_timer():
     if timer_running:
         elapsed = int(time.time() - start_time)
         h, m, s = elapsed // 3600, (elapsed % 3600) // 60, elapsed % 60
         timer_label.config(text=f"Time: {h:02d}:{m:02d}:{s:02d}")
+        update_stats()
         root.after(1000, update_timer)
 
+def update_stats():
+    """Throughput over the last minute and current queue depth"""
+    status = processing_excel.pipeline_status()
+    waiting = (status['intake_settling'] + status['file_queue_depth']
+               + status['preprocessing_queue_depth'])
+    stats_label.config(text=(
+        f"{metrics.rate('files_finished') * 60:.1f} files/min · "
+        f"{metrics.rate('rows_cleaned'):,.0f} rows/s | "
+        f"Queue: {waiting} waiting · {status['files_in_flight']} in flight"
+    ))
+
 def poll_logs():
     try:
         while True:
@@ -50,38 +74,48 @@ def log(message):
     log_text.see(tk.END)
     log_text.config(state=tk.DISABLED)
 
-# GUI Setup
-root = tk.Tk()
-root.title("Excel Processor")
+# Guarded so worker processes spawned by processing_excel don't open a window
+if __name__ == '__main__':
+    # GUI Setup
+    root = tk.Tk()
+    root.title("Excel Processor")
+
+    frame = tk.Frame(root, padx=20, pady=10)
+    frame.pack()
+
+    start_btn = tk.Button(frame, text="Start", command=start, bg="green", fg="white", width=10)
+    start_btn.grid(row=0, column=0, padx=10)
 
-frame = tk.Frame(root, padx=20, pady=10)
-frame.pack()
+    stop_btn = tk.Button(frame, text="Stop", command=stop, bg="red", fg="white", width=10)
+    stop_btn.grid(row=0, column=1, padx=10)
 
-start_btn = tk.Button(frame, text="Start", command=start, bg="green", fg="white", width=10)
-start_btn.grid(row=0, column=0, padx=10)
+    status_label = tk.Label(frame, text="Status: Stopped", fg="red", font=("Arial", 12))
+    status_label.grid(row=1, column=0, columnspan=2, pady=10)
 
-stop_btn = tk.Button(frame, text="Stop", command=stop, bg="red", fg="white", width=10)
-stop_btn.grid(row=0, column=1, padx=10)
+    timer_label = tk.Label(frame, text="Time: 00:00:00", font=("Courier", 14))
+    timer_label.grid(row=2, column=0, columnspan=2, pady=5)
 
-status_label = tk.Label(frame, text="Status: Stopped", fg="red", font=("Arial", 12))
-status_label.grid(row=1, column=0, columnspan=2, pady=10)
+    stats_label = tk.Label(frame, text=idle_stats_text, font=("Courier", 10))
+    stats_label.grid(row=3, column=0, columnspan=2, pady=5)
 
-timer_label = tk.Label(frame, text="Time: 00:00:00", font=("Courier", 14))
-timer_label.grid(row=2, column=0, columnspan=2, pady=5)
+    profile_var = tk.BooleanVar(value=profiling.enabled)
+    profile_check = tk.Checkbutton(frame, text="Profile files (cProfile + tracemalloc)",
+                                   variable=profile_var, command=toggle_profiling)
+    profile_check.grid(row=4, column=0, columnspan=2, pady=5)
 
-log_frame = tk.Frame(root)
-log_frame.pack(padx=10, pady=10)
+    log_frame = tk.Frame(root)
+    log_frame.pack(padx=10, pady=10)
 
-log_text = tk.Text(log_frame, height=20, width=80, state=tk.DISABLED, wrap=tk.WORD)
-log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    log_text = tk.Text(log_frame, height=20, width=80, state=tk.DISABLED, wrap=tk.WORD)
+    log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-scrollbar = tk.Scrollbar(log_frame, command=log_text.yview)
-scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-log_text.config(yscrollcommand=scrollbar.set)
+    scrollbar = tk.Scrollbar(log_frame, command=log_text.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    log_text.config(yscrollcommand=scrollbar.set)
 
-root.protocol("WM_DELETE_WINDOW", lambda: (stop(), root.destroy()))
-poll_logs()
-root.mainloop()
+    root.protocol("WM_DELETE_WINDOW", lambda: (stop(), root.destroy()))
+    poll_logs()
+    root.mainloop()
   
 
   
\ No newline at end of file
@@ -0,0 +1,176 @@
+# batch_process.py
+"""Headless batch run: normalize, filter and merge a directory of workbooks.
+
+Runs the same stages as the watcher (detect_header_and_normalize ->
+apply_combined_filters -> session merge) without Tkinter or watchdog, fans
+files out across the worker pool, prints a throughput summary and exits
+non-zero when any file fails.
+
+    python batch_process.py archive/2024/ -o merged.parquet
+    python batch_process.py "drops/*.xlsx" --workers 8 --format csv -q
+
+Every file's stage goes to the job journal (jobs.db next to --db); after a
+crash or Ctrl-C, rerun with --resume to finish only the outstanding files.
+"""
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+
+import processing_excel
+import profiling
+
+
+def collect_files(inputs, recursive=False):
+    """Workbooks named by directories and/or glob patterns, in a stable order"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive)
+        files.extend(os.path.abspath(path) for path in candidates
+                     if os.path.isfile(path) and processing_excel.is_watched_workbook(path))
+    return sorted(dict.fromkeys(files))
+
+
+def print_logs(quiet, stop_event):
+    """Drain processing_excel's log queue so it doesn't grow for the whole run"""
+    log_queue = processing_excel.get_log_queue()
+    while not (stop_event.is_set() and log_queue.empty()):
+        try:
+            msg = log_queue.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if not quiet:
+            print(msg)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process supplier workbooks into one merged output.")
+    parser.add_argument('inputs', nargs='+', help="input directories and/or glob patterns")
+    parser.add_argument('-o', '--output', default='output.xlsx',
+                        help="merged output path (default: output.xlsx)")
+    parser.add_argument('-f', '--format', choices=sorted(processing_excel.writers.WRITERS),
+                        help="output format (default: from the output extension)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes; 0 runs the single-process pipeline")
+    parser.add_argument('--engine', choices=processing_excel.readers.ENGINES, default=processing_excel.READER_ENGINE,
+                        help="workbook reader (default: calamine when installed, else openpyxl)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="search directories recursively")
+    parser.add_argument('--db', default=processing_excel.DB_PATH, help="supplier mapping database")
+    parser.add_argument('--filter-db', default=processing_excel.FILTER_DB_PATH, help="filter database")
+    parser.add_argument('--metrics', metavar='PATH', help="export stage timings in Prometheus text format")
+    parser.add_argument('--no-cache', action='store_true', help="ignore the processing cache")
+    parser.add_argument('--profile', nargs='?', const=profiling.PROFILE_DIR, metavar='DIR',
+                        help=f"profile every file's normalize/filter and the merge into DIR "
+                             f"(default: {profiling.PROFILE_DIR}; also set by {profiling.ENV_VAR}=1)")
+    parser.add_argument('--resume', action='store_true',
+                        help="finish the files the job journal lists as unfinished or failed, skip done ones")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only print the summary")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in processing_excel.writers.WRITERS:
+        print(f"❌ Unsupported output format: {fmt}")
+        return 2
+
+    # A rerun into the same folder mustn't read back its own earlier output
+    output = processing_excel.writers.output_path_for(os.path.abspath(args.output), fmt)
+    files = [path for path in collect_files(args.inputs, args.recursive)
+             if not processing_excel.is_merge_output(path, output)]
+    if not files:
+        print("❌ No workbooks found for: " + ", ".join(args.inputs))
+        return 2
+
+    processing_excel.LOG_TO_CONSOLE = False
+    processing_excel.MERGED_OUTPUT_PATH = os.path.abspath(args.output)
+    processing_excel.OUTPUT_FORMAT = fmt
+    processing_excel.DB_PATH = os.path.abspath(args.db)
+    processing_excel.FILTER_DB_PATH = os.path.abspath(args.filter_db)
+    processing_excel.PROCESSING_CACHE = not args.no_cache
+    processing_excel.WORKER_PROCESSES = max(args.workers, 0)
+    processing_excel.READER_ENGINE = args.engine
+    processing_excel.METRICS_EXPORT_PATH = args.metrics and os.path.abspath(args.metrics)
+    if args.profile:
+        profiling.set_enabled(True, os.path.abspath(args.profile))
+
+    resume = []
+    if args.resume:
+        # Unfinished files come back through resume_jobs(). The output is
+        # written from scratch, so done files are merged again too: from their
+        # cached results where possible, else reprocessed. Skipped stay skipped.
+        jobs = processing_excel.get_journal()
+        stages = {path: jobs.stage_of(path) for path in files}
+        unfinished = [path for path in files if stages[path] in processing_excel.journal.UNFINISHED]
+        new = [path for path in files if stages[path] in (None, 'failed')]
+        done = [path for path in files if stages[path] == 'done']
+        print(f"⏯️ Resuming: {len(unfinished)} unfinished, {len(new)} new or failed, "
+              f"{len(done)} already done (merged again)")
+        if not unfinished and not new:
+            print("✅ Nothing left to do")
+            return 0
+        resume = unfinished + done
+        files = resume + new
+    else:
+        new = files
+
+    # Match the whole run against the supplier DB in one call, so files no
+    # supplier maps are reported up front instead of failing one by one
+    suppliers = processing_excel.get_names_from_filenames(sorted({os.path.basename(path) for path in files}))
+    unmapped = {path for path in files if suppliers[os.path.basename(path)] is None}
+    for path in sorted(unmapped):
+        print(f"❌ No supplier mapping for: {path}")
+    resume = [path for path in resume if path not in unmapped]
+    new = [path for path in new if path not in unmapped]
+
+    stop_logging = threading.Event()
+    log_thread = threading.Thread(target=print_logs, args=(args.quiet, stop_logging), daemon=True)
+    log_thread.start()
+
+    total_bytes = sum(os.path.getsize(path) for path in files if os.path.exists(path))
+    start = time.perf_counter()
+    if processing_excel.WORKER_PROCESSES > 0:
+        processing_excel.start_worker_pool()
+        threading.Thread(target=processing_excel.dispatch_to_pool, daemon=True).start()
+    else:
+        threading.Thread(target=processing_excel.process_queue, daemon=True).start()
+        threading.Thread(target=processing_excel.process_queue_and_filter, daemon=True).start()
+
+    # One session for everything: resumed files alone mustn't trigger the merge
+    with processing_excel.holding_session():
+        if resume:
+            processing_excel.resume_jobs(resume, processing_excel.journal.UNFINISHED + ('done',))
+        for path in new:
+            processing_excel.enqueue_file(path)
+    processing_excel.wait_until_idle()
+    elapsed = time.perf_counter() - start
+    processing_excel.stop_worker_pool()
+
+    stop_logging.set()
+    log_thread.join()
+
+    failed = [path for path in files if path not in processing_excel.processed_files]
+    merge = processing_excel.default_tenant.last_merge
+    elapsed = max(elapsed, 1e-9)
+    print(f"📊 {len(files) - len(failed)}/{len(files)} files, {merge['rows']} rows, "
+          f"{total_bytes / 1024 ** 2:.1f} MB in {elapsed:.2f}s")
+    print(f"⚡ {len(files) / elapsed:.2f} files/s, {merge['rows'] / elapsed:,.0f} rows/s, "
+          f"{total_bytes / 1024 ** 2 / elapsed:.2f} MB/s")
+    if merge['paths']:
+        print(f"✅ Output: {', '.join(merge['paths'])}")
+    for path in failed:
+        if path not in unmapped:
+            print(f"❌ Failed: {path}")
+    return 1 if failed or not merge['paths'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""End-to-end per-file latency: enqueue -> cleaned, plus time to session merge.
+
+Usage: python benchmarks/bench_latency.py [files] [rows] [workers]
+workers = 0 runs the two-thread normalize -> filter pipeline.
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import processing_excel as pe
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        seed_rule_dbs(tmp_dir)
+        paths = [make_workbook(os.path.join(tmp_dir, f"{SUPPLIER}_{i}.xlsx"), rows, seed=i) for i in range(files)]
+
+        pe.log = lambda msg: None
+        pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+        pe.FILTER_DB_PATH = os.path.join(tmp_dir, 'filter.db')
+        pe.MERGED_OUTPUT_PATH = os.path.join(tmp_dir, 'output.csv')
+        pe.OUTPUT_FORMAT = 'csv'
+        pe.PROCESSING_CACHE = False
+        pe.WORKER_PROCESSES = workers
+
+        enqueued = {}
+        finished = {}
+        accept = pe.accept_cleaned_file
+
+        def timed_accept(file_path, *args, **kwargs):
+            finished[file_path] = time.perf_counter()
+            return accept(file_path, *args, **kwargs)
+
+        pe.accept_cleaned_file = timed_accept
+
+        if workers > 0:
+            pe.start_worker_pool()
+            # Spawn the workers before timing so startup isn't counted per file
+            for future in [pe.worker_pool.submit(time.sleep, 0.2) for _ in range(workers)]:
+                future.result()
+            threading.Thread(target=pe.dispatch_to_pool, daemon=True).start()
+        else:
+            threading.Thread(target=pe.process_queue, daemon=True).start()
+            threading.Thread(target=pe.process_queue_and_filter, daemon=True).start()
+
+        start = time.perf_counter()
+        for path in paths:
+            enqueued[path] = time.perf_counter()
+            pe.enqueue_file(path)
+        pe.wait_until_idle()
+        total = time.perf_counter() - start
+        pe.stop_worker_pool()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    latencies = sorted(finished[p] - enqueued[p] for p in paths if p in finished)
+    print(f"{files} files x {rows} rows, workers={workers}")
+    print(f"per-file latency: mean {statistics.mean(latencies):.3f}s  "
+          f"p50 {latencies[len(latencies) // 2]:.3f}s  max {latencies[-1]:.3f}s")
+    print(f"enqueue -> merged: {total:.2f}s ({files / total:.1f} files/s)")
+
+
+if __name__ == '__main__':
+    main()
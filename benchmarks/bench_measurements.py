@@ -0,0 +1,63 @@
+"""split_measurement_columns: per-row apply (old) vs vectorized regex extract (new).
+
+Usage: python benchmarks/bench_measurements.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import processing_excel as pe
+
+
+def legacy_split(df, match_col, new_cols):
+    """The previous implementation: one pd.Series per row via apply"""
+    def parse_expr(val):
+        try:
+            val = str(val)
+            a, rest = val.split('-')
+            b, c = rest.split('*')
+            return float(a), float(b), float(c)
+        except:
+            return None, None, None
+
+    df[new_cols] = df[match_col].apply(lambda x: pd.Series(parse_expr(x)))
+    df.drop(columns=[match_col], inplace=True)
+    return df
+
+
+def make_column(rows):
+    rng = np.random.default_rng(0)
+    a = rng.integers(1, 100, rows)
+    values = pd.Series([f"{x}-{x + 5}*{x % 7 + 1}" for x in a], dtype=object)
+    values[::50] = "n/a"  # some messy rows
+    return pd.DataFrame({'Measurements': values})
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    pe.log = lambda msg: None
+    new_cols = pe.MEASUREMENT_RULES[('abc', 'Measurements')]['new_cols']
+
+    df = make_column(rows)
+    start = time.perf_counter()
+    new = pe.split_measurement_columns(df.copy(), 'abc')
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    old = legacy_split(df.copy(), 'Measurements', new_cols)
+    legacy = time.perf_counter() - start
+
+    same = np.allclose(new[new_cols].to_numpy(float), old[new_cols].to_numpy(float), equal_nan=True)
+    print(f"{rows} rows")
+    print(f"legacy apply:   {legacy:.2f}s")
+    print(f"vectorized:     {vectorized:.2f}s")
+    print(f"speedup:        {legacy / vectorized:.1f}x  (results identical: {same})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Column projection: normalize time with and without lazy column building.
+
+Every width normalizes (and cleans) the same workbook with COLUMN_PROJECTION
+off and on, checks both give the same frame, and prints the speedup and the
+cells projection skipped. A second pass keeps the measurement split outputs
+too, so the projected source columns include the measurement column.
+
+Usage: python benchmarks/bench_projection.py [rows] [engine]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import processing_excel as pe
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+EXTRA_COLUMNS = [0, 8, 32]
+
+
+def timed_clean(path, projection):
+    pe.COLUMN_PROJECTION = projection
+    metrics.reset()
+    start = time.perf_counter()
+    df = pe.filter_file(path, pe.normalize_file(path))
+    return df, time.perf_counter() - start, metrics.snapshot()['counters'].get('cells_skipped', 0)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pe.READER_ENGINE = sys.argv[2] if len(sys.argv) > 2 else 'auto'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        seed_rule_dbs(tmp_dir)
+        pe.log = lambda msg: None
+        pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+        pe.FILTER_DB_PATH = os.path.join(tmp_dir, 'filter.db')
+
+        for required in (['color'], ['color', 'Min', 'Height']):
+            pe.REQUIRED_HEADERS = required
+            print(f"\n{rows} rows, engine={pe.READER_ENGINE}, kept columns {required}")
+            print(f"{'columns':>7} {'full':>8} {'projected':>10} {'speedup':>8} {'cells skipped':>14}")
+            for extra in EXTRA_COLUMNS:
+                path = make_workbook(os.path.join(tmp_dir, f"{SUPPLIER}_{extra}.xlsx"), rows,
+                                     preamble=3, seed=extra, extra_columns=extra)
+                full, full_time, _ = timed_clean(path, False)
+                projected, projected_time, skipped = timed_clean(path, True)
+                pd.testing.assert_frame_equal(projected, full)
+                print(f"{4 + extra:>7} {full_time:>7.2f}s {projected_time:>9.2f}s "
+                      f"{full_time / projected_time:>7.2f}x {skipped:>14,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Reader engines: equivalence with openpyxl and read throughput.
+
+Checks that every installed engine returns exactly the rows openpyxl does
+(on an edge-case workbook and on synthetic supplier files, through
+detect_header_row_from_db), that .csv drops give the same cleaned values,
+then times header detection + dataframe build per engine.
+
+Usage: python benchmarks/bench_readers.py [files] [rows]
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import processing_excel as pe
+import readers
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+
+def edge_case_workbook(path):
+    """Offsets, gaps, empty/narrow sheets and every common cell type"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Data'
+    ws['C3'] = 'Colour'
+    ws['D3'] = 'Size'
+    ws['E3'] = 'Qty'
+    ws.append([None, None, 'red', '1-2*3', 4])
+    ws.append([None, None, 'blue', None, 2.5])
+    ws.append([])
+    ws.append([None, None, True, datetime(2024, 5, 6, 7, 8), date(2024, 1, 2)])
+    ws.append([None, None, ' padded ', -3, 10 ** 12])
+    ws['H12'] = 'far away'
+    wb.create_sheet('Empty')
+    narrow = wb.create_sheet('Narrow')
+    narrow.append(['only'])
+    narrow.append(['one'])
+    wb.save(path)
+    return path
+
+
+def read_all(path, engine):
+    with readers.open_workbook(path, engine) as wb:
+        return [(sheet.title, sheet.max_column, list(sheet.iter_rows())) for sheet in wb.worksheets]
+
+
+def check_rows(path, engines):
+    expected = read_all(path, 'openpyxl')
+    for engine in engines:
+        got = read_all(path, engine)
+        assert got == expected, f"{engine} rows differ from openpyxl:\n{got}\n!=\n{expected}"
+    print(f"✅ raw rows identical on edge cases: {', '.join(engines)}")
+
+
+def check_frames(paths, engines):
+    for path in paths:
+        pe.READER_ENGINE = 'openpyxl'
+        expected = pe.detect_header_row_from_db(path, SUPPLIER)
+        for engine in engines:
+            pe.READER_ENGINE = engine
+            pd.testing.assert_frame_equal(pe.detect_header_row_from_db(path, SUPPLIER), expected)
+    print(f"✅ detect_header_row_from_db frames identical on {len(paths)} files: {', '.join(engines)}")
+
+
+def check_csv(path, tmp_dir):
+    """A csv export of the same sheet gives the same text after header detection"""
+    pe.READER_ENGINE = 'openpyxl'
+    expected = pe.detect_header_row_from_db(path, SUPPLIER)
+    csv_path = os.path.join(tmp_dir, os.path.splitext(os.path.basename(path))[0] + '.csv')
+    with readers.open_workbook(path, 'openpyxl') as wb:
+        pd.DataFrame(list(wb.worksheets[0].iter_rows())).to_csv(csv_path, index=False, header=False, sep=';')
+    got = pe.detect_header_row_from_db(csv_path, SUPPLIER)
+    expected = expected.head(len(got))  # the csv holds the first sheet only
+    pd.testing.assert_frame_equal(got, expected.astype(str).where(expected.notna(), None).astype(object),
+                                  check_dtype=False)
+    print("✅ csv drop matches the xlsx after header detection (values as text)")
+
+
+def throughput(paths, engine, rows_per_file):
+    pe.READER_ENGINE = engine
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    start = time.perf_counter()
+    for path in paths:
+        pe.detect_header_row_from_db(path, SUPPLIER)
+    elapsed = time.perf_counter() - start
+    print(f"{engine:>9}: {elapsed:7.3f}s  {total_bytes / 1024 ** 2 / elapsed:7.2f} MB/s  "
+          f"{len(paths) * rows_per_file / elapsed:10,.0f} rows/s")
+    return elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    engines = ['openpyxl'] + (['calamine'] if readers.calamine_available() else [])
+    if len(engines) == 1:
+        print("⚠️ python-calamine not installed, only openpyxl will be measured")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        seed_rule_dbs(tmp_dir)
+        pe.log = lambda msg: None
+        pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+        paths = [make_workbook(os.path.join(tmp_dir, f"{SUPPLIER}_{i}.xlsx"), rows, preamble=3,
+                               sheets=2, seed=i, extra_columns=4) for i in range(files)]
+
+        check_rows(edge_case_workbook(os.path.join(tmp_dir, 'edge.xlsx')), engines)
+        check_frames(paths[:2], engines)
+        check_csv(paths[0], tmp_dir)
+
+        print(f"\n{files} files x 2 sheets x {rows} rows")
+        timings = {engine: throughput(paths, engine, rows * 2) for engine in engines}
+        if 'calamine' in timings:
+            print(f"calamine speedup: {timings['openpyxl'] / timings['calamine']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Per-file rule lookup cost: direct SQLite queries vs the in-memory rule cache.
+
+Usage: python benchmarks/bench_rule_lookup.py [suppliers] [columns] [files]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db1
+import db2
+import processing_excel as pe
+
+
+def seed(tmp_dir, suppliers, columns):
+    row_db = os.path.join(tmp_dir, 'row_clean.db')
+    conn = sqlite3.connect(row_db)
+    db1.create_table(conn)
+    conn.executemany(
+        "INSERT OR IGNORE INTO person (name, col_name, norm_col_name) VALUES (?, ?, ?)",
+        [(f"supplier{s}", f"Col {c}", f"Norm{c}") for s in range(suppliers) for c in range(columns)],
+    )
+    conn.commit()
+    conn.close()
+
+    filter_db = os.path.join(tmp_dir, 'filter.db')
+    conn = sqlite3.connect(filter_db)
+    db2.create_table(conn)
+    conn.executemany(
+        "INSERT INTO data_filter (company, col_name, raw_value, norm_value) VALUES (?, ?, ?, ?)",
+        [("all", "color", f"value{v}", f"value{v}") for v in range(500)],
+    )
+    conn.commit()
+    conn.close()
+    return row_db, filter_db
+
+
+def uncached_lookup(row_db, filter_db, name):
+    """What every file paid before the cache: four connections, three filtered scans"""
+    conn = sqlite3.connect(row_db)
+    conn.execute("SELECT DISTINCT name FROM person").fetchall()
+    conn.close()
+
+    conn = sqlite3.connect(row_db)
+    conn.execute("SELECT col_name FROM person WHERE LOWER(name)=?", (name,)).fetchall()
+    conn.close()
+
+    conn = sqlite3.connect(row_db)
+    conn.execute("SELECT col_name, norm_col_name FROM person WHERE LOWER(name)=?", (name,)).fetchall()
+    conn.close()
+
+    conn = sqlite3.connect(filter_db)
+    rows = conn.execute("SELECT col_name, raw_value FROM data_filter").fetchall()
+    conn.close()
+    filter_dict = {}
+    for col, raw in rows:
+        filter_dict.setdefault(col.lower(), set()).add(raw.lower())
+
+
+def cached_lookup(filter_db, name):
+    pe.get_supplier_rules()['names']
+    pe.get_db_column_names(name)
+    pe.load_mappings_from_db(name)
+    pe.get_filter_rules(filter_db)
+
+
+def main():
+    suppliers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    files = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    pe.log = lambda msg: None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        row_db, filter_db = seed(tmp_dir, suppliers, columns)
+        pe.DB_PATH = row_db
+        names = [f"supplier{i % suppliers}" for i in range(files)]
+
+        start = time.perf_counter()
+        for name in names:
+            uncached_lookup(row_db, filter_db, name)
+        before = (time.perf_counter() - start) / files
+
+        pe.clear_rule_cache()
+        start = time.perf_counter()
+        for name in names:
+            cached_lookup(filter_db, name)
+        after = (time.perf_counter() - start) / files
+
+    print(f"{suppliers} suppliers x {columns} columns, {files} files")
+    print(f"before (sqlite per call): {before * 1000:.3f} ms/file")
+    print(f"after  (rule cache):      {after * 1000:.3f} ms/file  (includes one cold load)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Intra-file sheet parallelism: one big workbook in the default worker pool.
+
+Every sheet count sends the same workbook through the file pool (default
+WORKER_PROCESSES) once with its sheets parsed in the worker and once with
+the sheet processes idle_sheet_processes() grants a file that arrives on
+its own, checks both give the same frame and prints the speedup.
+
+Usage: python benchmarks/bench_sheets.py [rows per sheet] [SHEET_PROCESSES] [engine]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import processing_excel as pe
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+SHEET_COUNTS = [1, 2, 4, 8, 12]
+
+
+def timed_clean(path, sheet_processes):
+    start = time.perf_counter()
+    df, _, error, _, _, _, _ = pe.worker_pool.submit(pe.normalize_and_filter, path, None, None,
+                                                  sheet_processes).result()
+    if error:
+        raise RuntimeError(error)
+    return df, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pe.SHEET_PROCESSES = int(sys.argv[2]) if len(sys.argv) > 2 else pe.SHEET_PROCESSES
+    pe.READER_ENGINE = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        seed_rule_dbs(tmp_dir)
+        pe.log = lambda msg: None
+        pe.LOG_TO_CONSOLE = False
+        pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+        pe.FILTER_DB_PATH = os.path.join(tmp_dir, 'filter.db')
+        pe.PROCESSING_CACHE = False
+        pe.SHEET_PARALLEL_MIN_BYTES = 0
+        pe.start_worker_pool()
+        # Spawn the workers before timing so startup isn't counted
+        for future in [pe.worker_pool.submit(time.sleep, 0.2) for _ in range(pe.WORKER_PROCESSES)]:
+            future.result()
+
+        print(f"{rows} rows per sheet, {pe.WORKER_PROCESSES} file workers, "
+              f"SHEET_PROCESSES={pe.SHEET_PROCESSES}, engine={pe.READER_ENGINE}")
+        print(f"{'sheets':>6} {'MB':>7} {'granted':>7} {'in worker':>10} {'granted':>9} {'speedup':>8}")
+        for sheets in SHEET_COUNTS:
+            path = make_workbook(os.path.join(tmp_dir, f"{SUPPLIER}_{sheets}.xlsx"), rows,
+                                 preamble=3, sheets=sheets, seed=sheets, extra_columns=4)
+            granted = pe.idle_sheet_processes(path)
+            sequential, seq_time = timed_clean(path, 1)
+            parallel, par_time = timed_clean(path, granted)
+            pd.testing.assert_frame_equal(parallel, sequential)
+            print(f"{sheets:>6} {os.path.getsize(path) / 1024 ** 2:>7.1f} {granted:>7} {seq_time:>9.2f}s "
+                  f"{par_time:>8.2f}s {seq_time / par_time:>7.2f}x")
+        pe.stop_worker_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Fair scheduling: how long a small drop waits behind another folder's dump.
+
+A big folder gets `dump` files and, right after, a small folder gets `drop`
+files. With one shared FIFO (no WATCH_FOLDERS) the drop waits for the whole
+dump; as two tenants the file queue alternates between them (and caps the
+big folder at `quota` files in flight), so the drop finishes early.
+
+Usage: python benchmarks/bench_tenants.py [dump] [drop] [rows] [workers] [quota]
+workers = 0 runs the two-thread normalize -> filter pipeline.
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import processing_excel as pe
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+
+def run(tmp_dir, name, folders, dump_paths, drop_paths):
+    pe.WATCH_FOLDERS = folders
+    pe.configure_tenants()
+    pe.processed_files.clear()  # the same files run again under each setup
+    pe.MERGED_OUTPUT_PATH = os.path.join(tmp_dir, f"output_{name}.csv")
+    finished = {}
+    accept = pe.accept_cleaned_file
+
+    def timed_accept(file_path, *args, **kwargs):
+        finished[file_path] = time.perf_counter()
+        return accept(file_path, *args, **kwargs)
+
+    pe.accept_cleaned_file = timed_accept
+    start = time.perf_counter()
+    for path in dump_paths + drop_paths:
+        pe.enqueue_file(path)
+    pe.wait_until_idle()
+    total = time.perf_counter() - start
+    pe.accept_cleaned_file = accept
+
+    drop_done = max(finished[p] for p in drop_paths) - start
+    dump_done = max(finished[p] for p in dump_paths) - start
+    print(f"{name:>5}: drop done {drop_done:6.2f}s  dump done {dump_done:6.2f}s  all merged {total:6.2f}s")
+
+
+def main():
+    dump = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    drop = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rows = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    quota = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        seed_rule_dbs(tmp_dir)
+        big, small = os.path.join(tmp_dir, 'big'), os.path.join(tmp_dir, 'small')
+        os.makedirs(big)
+        os.makedirs(small)
+        dump_paths = [make_workbook(os.path.join(big, f"{SUPPLIER}_{i}.xlsx"), rows, seed=i) for i in range(dump)]
+        drop_paths = [make_workbook(os.path.join(small, f"{SUPPLIER}_s{i}.xlsx"), rows, seed=dump + i)
+                      for i in range(drop)]
+
+        pe.log = lambda msg: None
+        pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+        pe.FILTER_DB_PATH = os.path.join(tmp_dir, 'filter.db')
+        pe.OUTPUT_FORMAT = 'csv'
+        pe.PROCESSING_CACHE = False
+        pe.JOURNAL_ENABLED = False
+        pe.WORKER_PROCESSES = workers
+
+        if workers > 0:
+            pe.start_worker_pool()
+            for future in [pe.worker_pool.submit(time.sleep, 0.2) for _ in range(workers)]:
+                future.result()
+            threading.Thread(target=pe.dispatch_to_pool, daemon=True).start()
+        else:
+            threading.Thread(target=pe.process_queue, daemon=True).start()
+            threading.Thread(target=pe.process_queue_and_filter, daemon=True).start()
+
+        print(f"{dump} files in big/, then {drop} in small/, {rows} rows each, workers={workers}")
+        run(tmp_dir, 'fifo', [], dump_paths, drop_paths)
+        run(tmp_dir, 'fair', [
+            {'path': big, 'quota': quota, 'output': os.path.join(tmp_dir, 'big.csv')},
+            {'path': small, 'output': os.path.join(tmp_dir, 'small.csv')},
+        ], dump_paths, drop_paths)
+        pe.stop_worker_pool()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == '__main__':
+    main()
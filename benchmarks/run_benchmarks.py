@@ -0,0 +1,223 @@
+"""Pipeline benchmark suite on synthetic supplier workbooks.
+
+Generates workbooks and matching rule databases, times each stage on its
+own (name matching, header detection, measurement split, filtering, merge)
+and the whole pipeline end to end, records peak RSS, and writes everything
+to a JSON file that can be compared across commits.
+
+    python benchmarks/run_benchmarks.py --files 40 --rows 20000 -o bench.json
+    python benchmarks/run_benchmarks.py --files 40 --rows 20000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import memory
+import processing_excel as pe
+from synthetic import SUPPLIER, make_workbook, seed_rule_dbs
+
+STAGES = [
+    'get_name_from_filename',
+    'detect_header_row_from_db',
+    'split_measurement_columns',
+    'apply_combined_filters',
+    'merge_session_files',
+]
+
+
+def to_mb(nbytes):
+    return None if nbytes is None else round(nbytes / 1024 ** 2, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate(tmp_dir, args):
+    seed_rule_dbs(tmp_dir)
+    paths = []
+    for i in range(args.files):
+        path = os.path.join(tmp_dir, f"{SUPPLIER}_supplier_{i}.xlsx")
+        make_workbook(path, args.rows, preamble=args.preamble, sheets=args.sheets,
+                      seed=i, extra_columns=args.extra_columns)
+        paths.append(path)
+    return paths
+
+
+def configure(tmp_dir, args):
+    pe.LOG_TO_CONSOLE = False
+    pe.log = lambda msg: None
+    pe.DB_PATH = os.path.join(tmp_dir, 'row_clean.db')
+    pe.FILTER_DB_PATH = os.path.join(tmp_dir, 'filter.db')
+    pe.MERGED_OUTPUT_PATH = os.path.join(tmp_dir, 'output')
+    pe.OUTPUT_FORMAT = args.format
+    pe.PROCESSING_CACHE = False
+    pe.clear_rule_cache()
+
+
+def time_stages(paths):
+    """Run every stage per file in isolation and sum the wall time of each.
+
+    The stages are normalize_file's own pieces, with the same column
+    projection and REQUIRED_HEADERS. Projection can leave the measurement
+    column unread, so split_measurement_columns is timed on an unprojected
+    read of the file (read untimed) rather than on a frame that lacks it.
+    """
+    totals = dict.fromkeys(STAGES, 0.0)
+    rows_in = 0
+    for path in paths:
+        start = time.perf_counter()
+        name = pe.get_name_from_filename(os.path.basename(path))
+        totals['get_name_from_filename'] += time.perf_counter() - start
+
+        mappings = pe.load_mappings_from_db(name)
+        projection = pe.column_projection(name, mappings)
+        start = time.perf_counter()
+        df = pe.detect_header_row_from_db(path, name, projection)
+        totals['detect_header_row_from_db'] += time.perf_counter() - start
+        rows_in += len(df)
+
+        df = pe.optimize_dtypes(df, os.path.basename(path))
+        df = pe.rename_columns(df, mappings)
+
+        full = pe.detect_header_row_from_db(path, name)
+        full = pe.rename_columns(pe.optimize_dtypes(full, os.path.basename(path)), mappings)
+        start = time.perf_counter()
+        pe.split_measurement_columns(full, name)
+        totals['split_measurement_columns'] += time.perf_counter() - start
+        del full
+        df = pe.keep_required_columns(pe.split_measurement_columns(df, name))
+
+        start = time.perf_counter()
+        df = pe.apply_combined_filters(df)
+        totals['apply_combined_filters'] += time.perf_counter() - start
+
+        # Appending is part of the merge in incremental mode
+        with pe.session_lock:
+            pe.tenant_of(path).files.add(path)
+        start = time.perf_counter()
+        pe.add_cleaned_frame(path, df)
+        totals['merge_session_files'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    pe.merge_session_files()
+    totals['merge_session_files'] += time.perf_counter() - start
+    return totals, rows_in
+
+
+def time_end_to_end(paths, workers):
+    pe.WORKER_PROCESSES = workers
+    pe.processed_files.clear()
+    if workers > 0:
+        pe.start_worker_pool()
+        for future in [pe.worker_pool.submit(time.sleep, 0.2) for _ in range(workers)]:
+            future.result()
+        threading.Thread(target=pe.dispatch_to_pool, daemon=True).start()
+    else:
+        threading.Thread(target=pe.process_queue, daemon=True).start()
+        threading.Thread(target=pe.process_queue_and_filter, daemon=True).start()
+
+    start = time.perf_counter()
+    for path in paths:
+        pe.enqueue_file(path)
+    pe.wait_until_idle()
+    elapsed = time.perf_counter() - start
+    pe.stop_worker_pool()
+    return elapsed
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}):")
+    for stage, seconds in results['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if old:
+            print(f"  {stage:28s} {old:8.3f}s -> {seconds:8.3f}s  ({old / max(seconds, 1e-9):.2f}x)")
+    old = baseline.get('end_to_end', {}).get('seconds')
+    new = results['end_to_end']['seconds']
+    if old:
+        print(f"  {'end_to_end':28s} {old:8.3f}s -> {new:8.3f}s  ({old / max(new, 1e-9):.2f}x)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Excel pipeline on synthetic workbooks.")
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=5000, help="data rows per sheet")
+    parser.add_argument('--sheets', type=int, default=1)
+    parser.add_argument('--preamble', type=int, default=3, help="rows before the header")
+    parser.add_argument('--extra-columns', type=int, default=6, help="unmapped columns per sheet")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes for the end-to-end run (0 = threads)")
+    parser.add_argument('--format', default='parquet', choices=sorted(pe.writers.WRITERS))
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        paths = generate(tmp_dir, args)
+        generate_seconds = time.perf_counter() - start
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+
+        configure(tmp_dir, args)
+        stages, rows_in = time_stages(paths)
+        stage_rss = to_mb(memory.peak_rss())
+
+        configure(tmp_dir, args)
+        end_to_end = time_end_to_end(paths, args.workers)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': vars(args) | {'input_mb': round(input_bytes / 1024 ** 2, 2), 'rows_in': rows_in},
+        'generate_seconds': round(generate_seconds, 3),
+        'stages': {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        'stages_per_file_ms': {stage: round(seconds / len(paths) * 1000, 3) for stage, seconds in stages.items()},
+        'end_to_end': {
+            'seconds': round(end_to_end, 4),
+            'files_per_s': round(len(paths) / end_to_end, 3),
+            'rows_per_s': round(rows_in / end_to_end, 1),
+            'mb_per_s': round(input_bytes / 1024 ** 2 / end_to_end, 3),
+        },
+        'peak_rss_mb': {
+            'stages': stage_rss,
+            'main': to_mb(memory.peak_rss()),
+            # Each worker reports its own peak with every result
+            'workers': to_mb(pe.worker_peak_rss) if args.workers > 0 else None,
+        },
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage, seconds in results['stages'].items():
+        print(f"{stage:28s} {seconds:8.3f}s  ({results['stages_per_file_ms'][stage]:.1f} ms/file)")
+    e2e = results['end_to_end']
+    print(f"{'end_to_end':28s} {e2e['seconds']:8.3f}s  ({e2e['files_per_s']} files/s, "
+          f"{e2e['rows_per_s']:,.0f} rows/s, {e2e['mb_per_s']} MB/s)")
+    print(f"peak RSS: {results['peak_rss_mb']}")
+    print(f"results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
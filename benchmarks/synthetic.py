@@ -0,0 +1,72 @@
+"""Synthetic supplier workbooks and matching rule databases for benchmarks."""
+import os
+import random
+import sqlite3
+
+from openpyxl import Workbook
+
+import db1
+import db2
+
+SUPPLIER = 'abc'
+COLUMNS = [('Colour', 'Color'), ('Size', 'Measurements'), ('Item', 'Item'), ('Qty', 'Qty')]
+COLORS = ['red', 'blue', 'Green', 'RED', 'black', 'white']
+
+
+def seed_rule_dbs(tmp_dir, supplier=SUPPLIER, columns=COLUMNS, allowed=('red', 'blue')):
+    """Create row_clean.db / filter.db in tmp_dir with mappings for supplier"""
+    row_db = os.path.join(tmp_dir, 'row_clean.db')
+    conn = sqlite3.connect(row_db)
+    db1.create_table(conn)
+    conn.executemany(
+        "INSERT OR IGNORE INTO person (name, col_name, norm_col_name) VALUES (?, ?, ?)",
+        [(supplier, col, norm) for col, norm in columns],
+    )
+    conn.commit()
+    conn.close()
+
+    filter_db = os.path.join(tmp_dir, 'filter.db')
+    conn = sqlite3.connect(filter_db)
+    db2.create_table(conn)
+    conn.executemany(
+        "INSERT INTO data_filter (company, col_name, raw_value, norm_value) VALUES (?, ?, ?, ?)",
+        [(supplier, 'color', value, value) for value in allowed],
+    )
+    conn.commit()
+    conn.close()
+    return row_db, filter_db
+
+
+def make_workbook(path, rows, preamble=2, sheets=1, seed=0, extra_columns=0, columns=COLUMNS):
+    """Supplier workbook with preamble rows, a header and messy 'a-b*c' values.
+
+    extra_columns adds unmapped columns (like the many a real supplier sheet
+    carries) that normalization drops again.
+    """
+    rng = random.Random(seed)
+    header = [col for col, _ in columns] + [f"Extra {i}" for i in range(extra_columns)]
+    wb = Workbook(write_only=True)
+    for sheet_no in range(sheets):
+        ws = wb.create_sheet(f"Sheet{sheet_no + 1}")
+        for i in range(preamble):
+            ws.append([f"Report line {i}", seed])
+        ws.append(header)
+        for r in range(rows):
+            a = rng.randint(1, 100)
+            if r % 50 == 0:
+                size = "n/a"
+            elif r % 17 == 0:
+                size = f" {a} - {a + 3} * 2 "  # stray spaces
+            else:
+                size = f"{a}-{a + rng.randint(1, 20)}*{rng.randint(1, 9)}"
+            values = {
+                'Colour': rng.choice(COLORS),
+                'Size': size,
+                'Item': f"item{r}",
+                'Qty': rng.randint(0, 500),
+            }
+            row = [values.get(col, f"v{r}") for col, _ in columns]
+            row.extend(rng.random() for _ in range(extra_columns))
+            ws.append(row)
+    wb.save(path)
+    return path
@@ -4,6 +4,9 @@ def create_connection(db_file):
     conn = None
     try:
         conn = sqlite3.connect(db_file)
+        # WAL lets the pipeline keep reading rules while an import is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
         print(f"✅ Connected to SQLite database: {db_file}")
     except sqlite3.Error as e:
         print(f"❌ Error: {e}")
@@ -28,8 +31,29 @@ def create_table(conn):
             ON person (name, col_name, norm_col_name);
         """)
 
+        # Case-insensitive supplier lookups (WHERE LOWER(name)=?)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_person_name_lower
+            ON person (LOWER(name));
+        """)
+
+        # Bumped on every change so processing_excel knows when to reload
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS rules_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO rules_version (id, version) VALUES (1, 0);
+            CREATE TRIGGER IF NOT EXISTS person_version_insert AFTER INSERT ON person
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS person_version_update AFTER UPDATE ON person
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS person_version_delete AFTER DELETE ON person
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+        """)
+
         conn.commit()
-        print("✅ Table 'person' and unique index are ready.")
+        print("✅ Table 'person' and indexes are ready.")
     except sqlite3.Error as e:
         print(f"❌ Error creating table: {e}")
 
@@ -60,6 +84,29 @@ def insert_person(conn, name, col_name, norm_col_name):
     except sqlite3.Error as e:
         print(f"❌ Error inserting person: {e}")
 
+def insert_persons(conn, rows, replace=False):
+    """Insert many (name, col_name, norm_col_name) rows in one transaction.
+
+    Duplicates are skipped. With replace=True the suppliers in rows lose
+    their existing mappings first. Returns the number of rows added.
+    """
+    rows = list(rows)
+    try:
+        with conn:
+            cursor = conn.cursor()
+            if replace:
+                names = sorted({row[0] for row in rows})
+                cursor.executemany("DELETE FROM person WHERE name = ?", [(name,) for name in names])
+                print(f"🗑️ Removed {cursor.rowcount} existing mappings for {len(names)} suppliers")
+            cursor.executemany(
+                "INSERT OR IGNORE INTO person (name, col_name, norm_col_name) VALUES (?, ?, ?)", rows)
+            added = cursor.rowcount
+        print(f"➕ Inserted {added} mappings ({len(rows) - added} duplicates skipped)")
+        return added
+    except sqlite3.Error as e:
+        print(f"❌ Error inserting persons: {e}")
+        return 0
+
 def select_all_persons(conn):
     try:
         sql_select = "SELECT * FROM person"
@@ -4,6 +4,9 @@ def create_connection(db_file):
     conn = None
     try:
         conn = sqlite3.connect(db_file)
+        # WAL lets the pipeline keep reading rules while an import is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
         print(f"Connected to SQLite database: {db_file}")
     except sqlite3.Error as e:
         print(e)
@@ -22,16 +25,63 @@ def create_table(conn):
         """
         cursor = conn.cursor()
         cursor.execute(sql_create_table)
-        print("Table 'data_filter' is ready.")
+
+        # Case-insensitive column lookups (WHERE LOWER(col_name)=?)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_data_filter_col_lower
+            ON data_filter (LOWER(col_name));
+        """)
+
+        # One row per (company, column, raw value); the latest norm_value wins
+        has_unique = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_unique_filter'"
+        ).fetchone()
+        if not has_unique:
+            cursor.execute("""
+                DELETE FROM data_filter
+                WHERE rowid NOT IN (
+                    SELECT MAX(rowid)
+                    FROM data_filter
+                    GROUP BY company, col_name, raw_value
+                );
+            """)
+            if cursor.rowcount:
+                print(f"Removed {cursor.rowcount} duplicate filter rows.")
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_filter
+                ON data_filter (company, col_name, raw_value);
+            """)
+
+        # Bumped on every change so processing_excel knows when to reload
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS rules_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO rules_version (id, version) VALUES (1, 0);
+            CREATE TRIGGER IF NOT EXISTS data_filter_version_insert AFTER INSERT ON data_filter
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS data_filter_version_update AFTER UPDATE ON data_filter
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS data_filter_version_delete AFTER DELETE ON data_filter
+            BEGIN UPDATE rules_version SET version = version + 1 WHERE id = 1; END;
+        """)
+        conn.commit()
+        print("Table 'data_filter' and indexes are ready.")
     except sqlite3.Error as e:
         print(e)
 
+UPSERT_FILTER_SQL = """
+INSERT INTO data_filter (company, col_name, raw_value, norm_value)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (company, col_name, raw_value) DO UPDATE
+SET norm_value = excluded.norm_value
+WHERE norm_value != excluded.norm_value
+"""
+
 def insert_data_filter(conn, company, col_name, raw_value, norm_value):
     try:
-        sql_insert = """
-        INSERT INTO data_filter (company, col_name, raw_value, norm_value)
-        VALUES (?, ?, ?, ?)
-        """
+        sql_insert = UPSERT_FILTER_SQL
         cursor = conn.cursor()
         cursor.execute(sql_insert, (company, col_name, raw_value, norm_value))
         conn.commit()
@@ -39,6 +89,28 @@ def insert_data_filter(conn, company, col_name, raw_value, norm_value):
     except sqlite3.Error as e:
         print(e)
 
+def upsert_data_filters(conn, rows, replace=False):
+    """Upsert many (company, col_name, raw_value, norm_value) rows in one transaction.
+
+    With replace=True the companies in rows lose their existing filter
+    values first. Returns the number of rows inserted or changed.
+    """
+    rows = list(rows)
+    try:
+        with conn:
+            cursor = conn.cursor()
+            if replace:
+                companies = sorted({row[0] for row in rows})
+                cursor.executemany("DELETE FROM data_filter WHERE company = ?", [(c,) for c in companies])
+                print(f"Removed {cursor.rowcount} existing filter rows for {len(companies)} companies")
+            cursor.executemany(UPSERT_FILTER_SQL, rows)
+            changed = cursor.rowcount
+        print(f"Upserted {changed} filter rows ({len(rows) - changed} unchanged)")
+        return changed
+    except sqlite3.Error as e:
+        print(e)
+        return 0
+
 def select_all_filters(conn):
     try:
         sql_select = "SELECT * FROM data_filter"
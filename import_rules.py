@@ -0,0 +1,118 @@
+# import_rules.py
+"""Bulk-load column mappings or filter values from a CSV/XLSX file.
+
+Every row goes in with one executemany in a single transaction, so a new
+client's rules load in well under a second. The databases run in WAL mode,
+so the pipeline keeps reading while an import writes, and the rules_version
+triggers make processing_excel pick up the change on its next file.
+
+    python import_rules.py mappings acme_columns.xlsx
+    python import_rules.py mappings columns.csv --supplier acme --replace
+    python import_rules.py filters colours.csv --db filter.db
+
+mappings files need name, col_name and norm_col_name columns; filters files
+need company, col_name, raw_value and optionally norm_value (defaults to
+raw_value). --supplier/--company fill in the first column when the file
+doesn't have it.
+"""
+import argparse
+import sys
+import time
+
+import db1
+import db2
+import readers
+
+COLUMNS = {
+    'mappings': ('name', 'col_name', 'norm_col_name'),
+    'filters': ('company', 'col_name', 'raw_value', 'norm_value'),
+}
+DEFAULT_DBS = {'mappings': 'row_clean.db', 'filters': 'filter.db'}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def read_rule_rows(path, kind, owner=None):
+    """(rows, skipped) from every sheet of path, in COLUMNS[kind] order"""
+    wanted = COLUMNS[kind]
+    rows = []
+    skipped = 0
+    with readers.open_workbook(path) as wb:
+        for sheet in wb.worksheets:
+            positions = None
+            for row in sheet.iter_rows():
+                if positions is None:
+                    header = [_text(cell).lower() for cell in row]
+                    if not any(header):
+                        continue
+                    missing = [col for col in wanted[1:3] if col not in header]
+                    if missing:
+                        raise ValueError(f"{path} [{sheet.title}]: missing columns {missing}")
+                    if wanted[0] not in header and owner is None:
+                        raise ValueError(f"{path} [{sheet.title}]: no '{wanted[0]}' column, "
+                                         f"pass --{'supplier' if kind == 'mappings' else 'company'}")
+                    positions = [header.index(col) if col in header else None for col in wanted]
+                    continue
+
+                values = [_text(row[pos]) if pos is not None and pos < len(row) else '' for pos in positions]
+                if positions[0] is None or not values[0]:
+                    values[0] = owner or ''
+                if kind == 'filters' and not values[3]:
+                    values[3] = values[2]
+                if all(values):
+                    rows.append(tuple(values))
+                elif any(values[1:]):
+                    skipped += 1
+    return rows, skipped
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import supplier column mappings or filter values.")
+    parser.add_argument('kind', choices=sorted(COLUMNS), help="what the file contains")
+    parser.add_argument('path', help="CSV or Excel file")
+    parser.add_argument('--db', help="target database (default: row_clean.db / filter.db)")
+    parser.add_argument('--supplier', '--company', dest='owner',
+                        help="supplier/company for rows that don't name one")
+    parser.add_argument('--replace', action='store_true',
+                        help="drop existing rules of the suppliers/companies in the file first")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        rows, skipped = read_rule_rows(args.path, args.kind, args.owner)
+    except (OSError, ValueError, readers.ReaderUnavailable) as e:
+        print(f"❌ {e}")
+        return 2
+    if skipped:
+        print(f"⚠️ Skipped {skipped} incomplete rows")
+    if not rows:
+        print(f"❌ No {args.kind} found in {args.path}")
+        return 2
+
+    db_module = db1 if args.kind == 'mappings' else db2
+    conn = db_module.create_connection(args.db or DEFAULT_DBS[args.kind])
+    if conn is None:
+        return 1
+    try:
+        db_module.create_table(conn)
+        if args.kind == 'mappings':
+            db1.insert_persons(conn, rows, replace=args.replace)
+        else:
+            db2.upsert_data_filters(conn, rows, replace=args.replace)
+        version = conn.execute("SELECT version FROM rules_version WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"✅ Imported {len(rows)} {args.kind} rows in {time.perf_counter() - start:.2f}s "
+          f"(rules version {version})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
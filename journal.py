@@ -0,0 +1,115 @@
+"""Durable job journal: where every file of the pipeline has got to.
+
+One row per input file in a SQLite database (WAL mode, next to
+row_clean.db by default) with its stage:
+
+    queued   enqueued, not cleaned yet
+    cleaned  cleaned; result_path holds the cleaned frame when it was cached
+    merged   appended to the open session output (output), not finalized
+    done     part of a finalized merge output
+    skipped  no supplier mapping / no data / duplicate content
+    failed   error holds the reason
+
+Nothing is deleted, so after a crash or a stop the unfinished rows say
+exactly what still has to be done.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+UNFINISHED = ('queued', 'cleaned', 'merged')
+
+
+class JobJournal:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                path TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                cache_key TEXT,
+                result_path TEXT,
+                output TEXT,
+                rows INTEGER,
+                error TEXT,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_stage ON jobs (stage)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _set(self, path, stage, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self._execute(
+            f"UPDATE jobs SET stage = ?, updated = ?{', ' + columns if columns else ''} WHERE path = ?",
+            (stage, time.time(), *fields.values(), path))
+
+    def file_queued(self, path):
+        try:
+            st = os.stat(path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        self._execute("""
+            INSERT INTO jobs (path, stage, size, mtime_ns, updated) VALUES (?, 'queued', ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                stage = 'queued', size = excluded.size, mtime_ns = excluded.mtime_ns,
+                cache_key = NULL, result_path = NULL, output = NULL, rows = NULL, error = NULL,
+                updated = excluded.updated
+        """, (path, size, mtime_ns, time.time()))
+
+    def file_cleaned(self, path, cache_key=None, result_path=None, rows=None):
+        self._set(path, 'cleaned', cache_key=cache_key, result_path=result_path, rows=rows)
+
+    def file_merged(self, path, output):
+        self._set(path, 'merged', output=output)
+
+    def file_skipped(self, path, reason):
+        self._set(path, 'skipped', error=reason)
+
+    def file_failed(self, path, error):
+        self._set(path, 'failed', error=str(error))
+
+    def merge_finished(self, paths, output=None):
+        """Files in paths made it into a finalized output (None keeps the recorded part)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "UPDATE jobs SET stage = 'done', output = COALESCE(?, output), updated = ? "
+                    "WHERE path = ? AND stage IN ('cleaned', 'merged')",
+                    [(output, now, path) for path in paths])
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stage_of(self, path):
+        rows = self._execute("SELECT stage FROM jobs WHERE path = ?", (path,))
+        return rows[0][0] if rows else None
+
+    def unfinished(self, stages=UNFINISHED):
+        """(path, stage, size, mtime_ns, cache_key, result_path) still to be done
+        (or in any of stages), oldest first"""
+        return self._execute(
+            f"SELECT path, stage, size, mtime_ns, cache_key, result_path FROM jobs "
+            f"WHERE stage IN ({', '.join('?' * len(stages))}) ORDER BY updated",
+            tuple(stages))
+
+    def counts(self):
+        return dict(self._execute("SELECT stage, COUNT(*) FROM jobs GROUP BY stage"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
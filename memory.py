@@ -0,0 +1,107 @@
+"""RAM budget for files in flight, estimated from their size on disk.
+
+A workbook takes far more memory once read than it does on disk (.xlsx is
+zipped XML, and a DataFrame of Python strings is bigger again), so every
+file reserves size * a per-type factor before it is read and hands the
+reservation back when it leaves the pipeline. acquire() blocks while the
+budget is used up, which keeps new files waiting in file_queue.
+"""
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FOOTPRINT_FACTORS = {'.xlsx': 12, '.xlsm': 12, '.xls': 4, '.csv': 4}
+DEFAULT_FACTOR = 12
+MIN_FOOTPRINT = 1024 ** 2
+
+
+def physical_memory():
+    """Total RAM in bytes, or None when it can't be determined"""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_footprint(path):
+    """Bytes reading path is expected to need"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    factor = FOOTPRINT_FACTORS.get(os.path.splitext(path)[1].lower(), DEFAULT_FACTOR)
+    return max(size * factor, MIN_FOOTPRINT)
+
+
+def peak_rss(include_children=False):
+    """Peak resident set size of this process in bytes, or None.
+
+    include_children also counts the largest child already waited for (a
+    worker's per-file sheet pools); running children never show up here.
+    """
+    if resource is not None:
+        scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is KiB on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if include_children:
+            peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        return peak * scale
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except ImportError:
+        return None
+
+
+def format_bytes(nbytes):
+    if nbytes is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if nbytes < 1024 or unit == 'GB':
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+class MemoryBudget:
+    """Byte-counting semaphore: acquire() waits until a reservation fits"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.reserved = 0
+        self.peak = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+
+    def fits(self, nbytes):
+        with self._cond:
+            return self.reserved + min(nbytes, self.limit) <= self.limit
+
+    def acquire(self, nbytes):
+        """Reserve nbytes, blocking until they fit; returns the amount reserved.
+
+        A file estimated above the whole budget is capped at the budget, so it
+        runs on its own instead of waiting forever.
+        """
+        nbytes = min(nbytes, self.limit)
+        with self._cond:
+            if self.reserved + nbytes > self.limit:
+                self.waits += 1
+                self._cond.wait_for(lambda: self.reserved + nbytes <= self.limit)
+            self.reserved += nbytes
+            self.peak = max(self.peak, self.reserved)
+        return nbytes
+
+    def release(self, nbytes):
+        with self._cond:
+            self.reserved = max(self.reserved - nbytes, 0)
+            self._cond.notify_all()
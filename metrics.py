@@ -0,0 +1,162 @@
+"""Per-file stage timings and pipeline counters.
+
+Every stage a file passes through (intake, queue waits, header detection,
+normalization, filtering, merging) is recorded as a span event: a dict with
+the stage, the file, its duration and any row/byte counts. Events are put on
+event_queue for consumers that want them one at a time and folded into the
+running totals that snapshot() returns and write_prometheus() exports.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+EVENT_QUEUE_SIZE = 10000  # Unread events past this are dropped; totals still count them
+RATE_WINDOW_SECONDS = 60
+
+event_queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+stage_totals = {}  # stage -> {'count', 'seconds', 'max_seconds', 'rows_in', 'rows_out', 'bytes', 'errors'}
+counters = {}  # name -> running total
+recent_counts = deque()  # (timestamp, name, value) inside RATE_WINDOW_SECONDS, for rate()
+started_at = time.time()
+metrics_lock = threading.Lock()
+
+SPAN_FIELDS = ('rows_in', 'rows_out', 'bytes')
+
+
+def emit(event):
+    """Fold one event into the totals and offer it to event_queue"""
+    with metrics_lock:
+        if event['type'] == 'span':
+            totals = stage_totals.get(event['stage'])
+            if totals is None:
+                totals = stage_totals[event['stage']] = dict.fromkeys(
+                    ('count', 'seconds', 'max_seconds', 'errors') + SPAN_FIELDS, 0)
+            totals['count'] += 1
+            totals['seconds'] += event['seconds']
+            totals['max_seconds'] = max(totals['max_seconds'], event['seconds'])
+            for field in SPAN_FIELDS:
+                totals[field] += event.get(field) or 0
+            if not event.get('ok', True):
+                totals['errors'] += 1
+        elif event['type'] == 'counter':
+            counters[event['name']] = counters.get(event['name'], 0) + event['value']
+            recent_counts.append((event['ts'], event['name'], event['value']))
+    try:
+        event_queue.put_nowait(event)
+    except queue.Full:
+        pass
+
+
+def record_span(stage, file_path, seconds, **fields):
+    emit({'type': 'span', 'stage': stage, 'file': file_path, 'seconds': seconds,
+          'ts': time.time(), 'pid': os.getpid(), **fields})
+
+
+@contextmanager
+def span(stage, file_path=None, **fields):
+    """Time the with-block as one stage; set rows_in/rows_out/bytes on the yielded dict"""
+    fields['ok'] = True
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException:
+        fields['ok'] = False
+        raise
+    finally:
+        record_span(stage, file_path, time.perf_counter() - start, **fields)
+
+
+def incr(name, value=1):
+    emit({'type': 'counter', 'name': name, 'value': value, 'ts': time.time(), 'pid': os.getpid()})
+
+
+def drain_events():
+    """Everything waiting on event_queue (worker processes ship these back)"""
+    events = []
+    try:
+        while True:
+            events.append(event_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return events
+
+
+def get_event_queue():
+    return event_queue
+
+
+def rate(name, window=None):
+    """Per-second rate of counter name over the last window seconds"""
+    window = window or RATE_WINDOW_SECONDS
+    now = time.time()
+    with metrics_lock:
+        while recent_counts and recent_counts[0][0] < now - RATE_WINDOW_SECONDS:
+            recent_counts.popleft()
+        total = sum(value for ts, key, value in recent_counts if key == name and ts >= now - window)
+        elapsed = min(window, now - started_at)
+    return total / elapsed if elapsed > 0 else 0.0
+
+
+def snapshot():
+    with metrics_lock:
+        return {
+            'stages': {stage: dict(totals) for stage, totals in stage_totals.items()},
+            'counters': dict(counters),
+        }
+
+
+def reset():
+    """Start a fresh set of totals (e.g. when the watcher is started again)"""
+    global started_at
+    with metrics_lock:
+        stage_totals.clear()
+        counters.clear()
+        recent_counts.clear()
+        started_at = time.time()
+    drain_events()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus(path, gauges=None, prefix='excel_pipeline'):
+    """Write totals (and current gauges) in Prometheus text format.
+
+    The file is replaced atomically, so it can be pointed at by node_exporter's
+    textfile collector or read by anything else polling it.
+    """
+    data = snapshot()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{prefix}_{name}{labels} {value}")
+
+    stages = sorted(data['stages'].items())
+    for field, kind, help_text in [
+        ('count', 'counter', "Files that went through each stage"),
+        ('seconds', 'counter', "Seconds spent in each stage"),
+        ('max_seconds', 'gauge', "Slowest single run of each stage"),
+        ('rows_in', 'counter', "Rows going into each stage"),
+        ('rows_out', 'counter', "Rows coming out of each stage"),
+        ('bytes', 'counter', "Bytes read by each stage"),
+        ('errors', 'counter', "Failed runs of each stage"),
+    ]:
+        name = f"stage_{field}" + ('_total' if kind == 'counter' else '')
+        metric(name, kind, help_text,
+               [(f'{{stage="{_label(stage)}"}}', totals[field]) for stage, totals in stages])
+    for name, value in sorted(data['counters'].items()):
+        metric(f"{name}_total", 'counter', name.replace('_', ' '), [('', value)])
+    for name, value in sorted((gauges or {}).items()):
+        metric(name, 'gauge', name.replace('_', ' '), [('', value)])
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
@@ -1,6 +1,7 @@
 import os
 import time
 import pandas as pd
+import numpy as np
 import sqlite3
 from queue import Queue
 from watchdog.observers import Observer
@@ -8,397 +9,1946 @@ from watchdog.events import FileSystemEventHandler
 from rapidfuzz import fuzz, process
 import threading
 import queue
-from openpyxl import load_workbook
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import re
+from urllib.request import pathname2url
+import bisect
+import itertools
+import operator
+import collections
+import hashlib
+import pickle
+import zipfile
+import writers
+import readers
+import metrics
+import memory
+import journal
+import profiling
+import tenants
 
 WATCH_FOLDER = r'enter/path/to/be/watched/here'
 DB_PATH = 'row_clean.db'
 TABLE_NAME = 'person'
 
-file_queue = Queue()
-preprocessing_queue = Queue()
+# Several watched folders (tenants, see tenants.py) in one process. Each entry
+# needs 'path' and may set 'name', 'recursive', 'output' (default:
+# <path>/output.xlsx), 'db_path', 'filter_db_path' and 'quota' (files in
+# flight at once). Empty = just WATCH_FOLDER with MERGED_OUTPUT_PATH.
+WATCH_FOLDERS = []
+TENANT_QUOTA = None  # Default per-folder quota; None = only MAX_IN_FLIGHT applies
+
+FILE_QUEUE_SIZE = 1000  # enqueue_file (and so intake) blocks once this many paths wait
+
+# Served round-robin between tenants, each held to its quota
+file_queue = tenants.FairQueue(FILE_QUEUE_SIZE, key=lambda path: tenant_of(path),
+                               quota=lambda tenant: tenant_quota(tenant))
+preprocessing_queue = Queue()  # Bounded by the memory budget: files hold a reservation here
 processed_files = set()
 observer = None
 log_queue = queue.Queue()
 merge_ready_files = []
 MERGED_OUTPUT_PATH = os.path.join(WATCH_FOLDER, "output.xlsx")
-session_normalized_queue = Queue()
 
-# Session tracking for merge logic
-session_files = set()  # Track files processed in current session
+# Echo log messages to stdout as well as log_queue
+LOG_TO_CONSOLE = True
+
+# Debug flag: also write <name>_normalized.<ext> intermediates to disk
+PERSIST_INTERMEDIATES = False
+
+# Output formats: 'xlsx', 'csv', 'parquet' or 'feather' (see writers.py).
+# xlsx is a final-export option only; intermediates use a columnar format.
+OUTPUT_FORMAT = 'xlsx'
+INTERMEDIATE_FORMAT = 'parquet'
+
+# 'incremental' appends each cleaned file to the output as soon as it's done;
+# 'batch' keeps every session frame in memory and writes them all at the end
+MERGE_MODE = 'incremental'
+
+# Dtype optimization right after header detection
+OPTIMIZE_DTYPES = True
+CATEGORY_MAX_RATIO = 0.5  # Text columns with unique/rows at or below this become categorical
+
+# Streaming reader settings
+HEADER_SCAN_ROWS = 50  # Header must appear within the first N rows of a sheet
+HEADER_MATCH_RATIO = 0.3  # Share of a row's values that must be DB column names
+HEADER_FUZZY_THRESHOLD = None  # e.g. 90 to also count near-miss header names
+READ_CHUNK_SIZE = 10000  # Rows buffered per chunk while building a dataframe
+READER_ENGINE = 'auto'  # 'calamine', 'openpyxl' or 'auto' (calamine when installed; see readers.py)
+SHEET_PROCESSES = 4  # Parse the sheets of one big workbook in this many processes (0/1 = off)
+SHEET_PARALLEL_MIN_BYTES = 32 * 1024 ** 2  # ... when the file is at least this large
+sheet_process_grant = None  # Pool workers: sheet processes the dispatcher spared for the current file
+COLUMN_PROJECTION = True  # Only build the columns that survive normalization
+
+# Session tracking for merge logic: every tenant has its own session
+# (files, frames, writer, last_merge, ...; see tenants.Tenant)
+default_tenant = tenants.Tenant('default')  # WATCH_FOLDER, batch runs, paths outside WATCH_FOLDERS
+folder_tenants = []  # Built from WATCH_FOLDERS by configure_tenants()
+tenant_config = None  # WATCH_FOLDERS folder_tenants was built from
+pending_files = set()  # Files currently running in the worker pool
 session_lock = threading.Lock()
 
+# Memory budget (memory.py): each file reserves its estimated in-memory size
+# before it's read and new files wait while the budget is used up. Batch-mode
+# merge inputs that don't fit next to the files in flight are spilled to disk.
+MEMORY_BUDGET = None  # bytes; None = half of physical memory
+MERGE_SPILL_DIR = '.merge_spill'
+memory_budget = None
+memory_reservations = {}  # path -> (budget, bytes reserved)
+SpilledFrame = collections.namedtuple('SpilledFrame', 'path shape columns')
+
+# Watcher intake: a file is queued once its size/mtime hold still this long
+INTAKE_SETTLE_SECONDS = 1.0
+# ... and it opens as a workbook; one that holds still but never does (corrupt,
+# not really a zip) is queued anyway after this long, to fail loudly there
+INTAKE_MAX_WAIT_SECONDS = 30.0
+intake_pending = {}  # path -> None (new event) or ((size, mtime), stable since)
+intake_seen_at = {}  # path -> perf_counter() of its first event, for the intake span
+intake_cond = threading.Condition()
+
+# Guards every tenant's outstanding/merges_running counts
+outstanding_cond = threading.Condition()
+
+# Worker pool: 0 keeps the single-threaded normalize -> filter pipeline
+WORKER_PROCESSES = os.cpu_count() or 1
+MAX_IN_FLIGHT = None  # Files submitted but not finished; None = 2 per worker
+worker_pool = None
+in_flight_slots = None
+# Finished pool futures wait here for their tenant's collector thread, which
+# accepts and merges them; the executor's own thread only hands them over
+completed_queues = {}  # tenant -> Queue of (file_path, future)
+worker_peak_rss = None  # Largest peak RSS a worker has reported with a result
+
+# Rule DB cache: (kind, db_path) -> (db signature, rules version, loaded rules)
+FILTER_DB_PATH = 'filter.db'
+rule_cache = {}
+rule_cache_lock = threading.Lock()
+filter_fingerprints = {}  # id(filter rules) -> (those rules, hash), see rules_fingerprint
+filter_plan_cache = {}  # (db_path, columns) -> (filter rules, compiled plan)
+
+# Persistent result cache keyed by file content + rule fingerprint
+PROCESSING_CACHE = True
+CACHE_DIR = '.pipeline_cache'
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # LRU-evicted down to this size
+CACHE_FORMAT_VERSION = 2  # Bump when normalize/filter logic changes
+# Settings that change a cleaned frame; part of every cache key, so changing
+# one (even across restarts) never serves a result built under the old value
+CACHE_KEY_SETTINGS = ('REQUIRED_HEADERS', 'OPTIMIZE_DTYPES', 'CATEGORY_MAX_RATIO', 'HEADER_SCAN_ROWS',
+                      'HEADER_MATCH_RATIO', 'HEADER_FUZZY_THRESHOLD', 'READER_ENGINE')
+cache_stats = {'hits': 0, 'misses': 0}
+
+# Stage timings and counters (metrics.py); set a path to export them in
+# Prometheus text format, e.g. for node_exporter's textfile collector
+METRICS_EXPORT_PATH = None
+queued_at = {}  # path -> perf_counter() when it entered file_queue / preprocessing_queue
+
+# Job journal (journal.py): every file's stage in SQLite, so after a crash or
+# a stop resume_jobs() queues what never got cleaned and merges what did
+JOURNAL_ENABLED = True
+JOURNAL_DB_PATH = None  # None = jobs.db next to DB_PATH
+job_journal = None
+
 file_counter = 0
 cleaned_counter = 0
 counter_lock = threading.Lock()
 
 def log(msg):
-    print(msg)
+    if LOG_TO_CONSOLE:
+        print(msg)
     log_queue.put(msg)
 
+# Profiling summaries (profiling.py) go through whatever log is at call time
+profiling.log = lambda msg: log(msg)
+
 def get_log_queue():
     return log_queue
 
-def get_name_from_filename(filename):
-    """Enhanced filename matching using substring and fuzzy matching"""
+def normalized_path(file_path):
+    """Path of the debug intermediate written when PERSIST_INTERMEDIATES is on"""
+    return os.path.splitext(file_path)[0] + '_normalized' + writers.EXTENSIONS[INTERMEDIATE_FORMAT]
+
+def configure_tenants(folders=None):
+    """Build the tenants of WATCH_FOLDERS (kept, sessions and all, while it's unchanged)"""
+    global folder_tenants, tenant_config
+    folders = WATCH_FOLDERS if folders is None else folders
+    if folders != tenant_config:
+        folder_tenants = [tenants.Tenant.from_config(config) for config in folders]
+        tenant_config = [dict(config) for config in folders]
+    return folder_tenants
+
+def all_tenants():
+    return [default_tenant] + folder_tenants
+
+def tenant_of(file_path):
+    """The tenant whose folder holds file_path (the deepest one), else default_tenant"""
+    best = default_tenant
+    for tenant in folder_tenants:
+        if tenant.contains(file_path) and (best is default_tenant or len(tenant.path) > len(best.path)):
+            best = tenant
+    return best
+
+def in_watched_folder(path):
+    """path is in a WATCH_FOLDERS tenant's folder, or in WATCH_FOLDER without them"""
+    if folder_tenants:
+        return tenant_of(path) is not default_tenant
+    folder = os.path.normcase(os.path.abspath(WATCH_FOLDER))
+    return os.path.dirname(os.path.normcase(os.path.abspath(path))) == folder
+
+def tenant_quota(tenant):
+    return tenant.quota if tenant.quota is not None else TENANT_QUOTA
+
+def tenant_label(tenant):
+    """' [name]' for log lines of a WATCH_FOLDERS tenant, '' for the default one"""
+    return '' if tenant is default_tenant else f" [{tenant.name}]"
+
+def rule_db_paths(file_path):
+    """(supplier mapping DB, filter DB) for file_path's tenant"""
+    tenant = tenant_of(file_path)
+    return tenant.db_path or DB_PATH, tenant.filter_db_path or FILTER_DB_PATH
+
+def merged_output_path(tenant=None):
+    """The tenant's merge output (MERGED_OUTPUT_PATH by default) with the extension of OUTPUT_FORMAT"""
+    tenant = tenant or default_tenant
+    if tenant.output:
+        path = tenant.output
+    elif tenant.path:
+        path = os.path.join(tenant.path, "output.xlsx")
+    else:
+        path = MERGED_OUTPUT_PATH
+    return writers.output_path_for(path, OUTPUT_FORMAT)
+
+def is_merge_output(path, output):
+    """path is the merged output or one of its rolled-over parts (<base>-<n><ext>)"""
+    path, output = os.path.normcase(os.path.abspath(path)), os.path.normcase(os.path.abspath(output))
+    if path == output:
+        return True
+    base, ext = os.path.splitext(output)
+    stem, path_ext = os.path.splitext(path)
+    head, _, part = stem.rpartition('-')
+    return path_ext == ext and head == base and part.isdigit()
+
+FUZZY_NAME_THRESHOLD = 70
+
+def clean_filename(filename):
+    """Filename without extension, digits or punctuation, lower-cased"""
     base = os.path.splitext(os.path.basename(filename))[0]
-    
-    # Clean the filename: remove special characters, numbers, and normalize
     cleaned_base = re.sub(r'[^a-zA-Z\s]', ' ', base)
-    cleaned_base = re.sub(r'\s+', ' ', cleaned_base).strip().lower()
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT name FROM person")
-    names = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    return base, re.sub(r'\s+', ' ', cleaned_base).strip().lower()
 
-    log(f"🔍 Matching filename: '{base}' (cleaned: '{cleaned_base}') against {len(names)} names from DB")
-    
-    # First try: exact substring matching
-    for name in names:
-        name_lower = name.lower()
-        if name_lower in cleaned_base or any(word in name_lower for word in cleaned_base.split()):
-            log(f"🎯 Substring match found: '{cleaned_base}' → '{name}'")
-            return name
-    
-    # Second try: fuzzy matching with lower threshold since we're doing substring first
-    names_lower = [name.lower() for name in names]
-    match, score, _ = process.extractOne(cleaned_base, names_lower, scorer=fuzz.ratio)
-    if score >= 70:  # Lowered threshold since substring didn't work
-        original_name = next(name for name in names if name.lower() == match)
-        log(f"🔍 Fuzzy match: '{cleaned_base}' → '{original_name}' (score: {score})")
-        return original_name
+class SupplierMatcher:
+    """Filename -> supplier name lookups, built once per mapping version.
+
+    Gives the same answers as scanning every name in DB order: the first
+    name that is contained in the cleaned filename, or that contains one of
+    its words, wins; otherwise the best fuzz.ratio score >= threshold.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.choices = [name.lower() for name in names]
+        self.first_index = {}
+        for i, name_lower in enumerate(self.choices):
+            self.first_index.setdefault(name_lower, i)
+        self.max_len = max((len(n) for n in self.choices), default=0)
+        # All names in one string so "word in name" is a single C-level find()
+        self.joined = '\0'.join(self.choices)
+        self.offsets = []
+        pos = 0
+        for name_lower in self.choices:
+            self.offsets.append(pos)
+            pos += len(name_lower) + 1
+
+    def _name_at(self, pos):
+        return bisect.bisect_right(self.offsets, pos) - 1
+
+    def substring_match(self, cleaned_base):
+        """Index of the first name matching by substring, or None"""
+        best = None
+        if '' in self.first_index:
+            best = self.first_index['']
+        for word in set(cleaned_base.split()):
+            pos = self.joined.find(word)
+            if pos != -1:
+                i = self._name_at(pos)
+                best = i if best is None else min(best, i)
+        # Names that appear inside the filename
+        n = len(cleaned_base)
+        for start in range(n):
+            for end in range(start + 1, min(n, start + self.max_len) + 1):
+                i = self.first_index.get(cleaned_base[start:end])
+                if i is not None and (best is None or i < best):
+                    best = i
+        return best
+
+    def match(self, cleaned_base):
+        """(name, kind, score) with kind 'substring', 'fuzzy' or None"""
+        if not self.names:
+            return None, None, 0
+        i = self.substring_match(cleaned_base)
+        if i is not None:
+            return self.names[i], 'substring', 100
+        _, score, i = process.extractOne(cleaned_base, self.choices, scorer=fuzz.ratio)
+        return self._fuzzy_result(i, score)
+
+    def match_many(self, cleaned_bases):
+        """Batch version of match(); fuzzy fallbacks are scored in one cdist call"""
+        results = [None] * len(cleaned_bases)
+        fuzzy = []
+        for k, cleaned_base in enumerate(cleaned_bases):
+            i = self.substring_match(cleaned_base) if self.names else None
+            if i is not None:
+                results[k] = (self.names[i], 'substring', 100)
+            elif self.names:
+                fuzzy.append(k)
+            else:
+                results[k] = (None, None, 0)
+        if fuzzy:
+            scores = process.cdist([cleaned_bases[k] for k in fuzzy], self.choices, scorer=fuzz.ratio)
+            for row, k in enumerate(fuzzy):
+                i = int(scores[row].argmax())
+                results[k] = self._fuzzy_result(i, float(scores[row][i]))
+        return results
+
+    def _fuzzy_result(self, i, score):
+        if score >= FUZZY_NAME_THRESHOLD:
+            # First name with this spelling, matching the old next(...) lookup
+            return self.names[self.first_index[self.choices[i]]], 'fuzzy', score
+        return None, None, score
+
+def _log_name_match(base, cleaned_base, result):
+    name, kind, score = result
+    if kind == 'substring':
+        log(f"🎯 Substring match found: '{cleaned_base}' → '{name}'")
+    elif kind == 'fuzzy':
+        log(f"🔍 Fuzzy match: '{cleaned_base}' → '{name}' (score: {score})")
     else:
         log(f"⚠️ No good match for '{cleaned_base}' (best score: {score})")
+
+def get_name_from_filename(filename, db_path=None):
+    """Enhanced filename matching using substring and fuzzy matching"""
+    base, cleaned_base = clean_filename(filename)
+    matcher = get_supplier_rules(db_path)['matcher']
+
+    log(f"🔍 Matching filename: '{base}' (cleaned: '{cleaned_base}') against {len(matcher.names)} names from DB")
+    result = matcher.match(cleaned_base)
+    _log_name_match(base, cleaned_base, result)
+    return result[0]
+
+def get_names_from_filenames(filenames, db_path=None):
+    """Resolve a whole drop of filenames at once: {filename: supplier name or None}"""
+    matcher = get_supplier_rules(db_path)['matcher']
+    cleaned = [clean_filename(filename) for filename in filenames]
+    results = matcher.match_many([cleaned_base for _, cleaned_base in cleaned])
+    for (base, cleaned_base), result in zip(cleaned, results):
+        _log_name_match(base, cleaned_base, result)
+    return {filename: result[0] for filename, result in zip(filenames, results)}
+
+def _db_signature(db_path):
+    """Changes whenever the database (or its WAL file) is written"""
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def rules_version(db_path):
+    """The rules_version counter db1/db2 triggers bump on every change, or None"""
+    try:
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT version FROM rules_version WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
         return None
+    return row[0] if row else None
+
+def _cached_rules(key, db_path, loader):
+    """Return loader(db_path), reloading only when the rules have changed.
+
+    An unchanged file signature is a hit without touching SQLite. When the
+    files did change (a write, a WAL checkpoint), rules_version decides;
+    databases without the counter are reloaded.
+    """
+    signature = _db_signature(db_path)
+    with rule_cache_lock:
+        entry = rule_cache.get((key, db_path))
+    if entry is not None and entry[0] == signature:
+        return entry[2]
+    version = rules_version(db_path)
+    if entry is not None and version is not None and entry[1] == version:
+        with rule_cache_lock:
+            rule_cache[(key, db_path)] = (signature, version, entry[2])
+        return entry[2]
+    rules = loader(db_path)
+    with rule_cache_lock:
+        rule_cache[(key, db_path)] = (signature, version, rules)
+    log(f"♻️ Loaded {key} rules from {db_path}" + (f" (version {version})" if version is not None else ""))
+    return rules
+
+def _load_supplier_rules(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT DISTINCT name FROM {TABLE_NAME}")
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT name, col_name, norm_col_name FROM {TABLE_NAME}")
+        columns = {}
+        mappings = {}
+        for name, col, norm in cursor.fetchall():
+            key = name.lower()
+            columns.setdefault(key, []).append(col.lower().strip())
+            mappings.setdefault(key, {})[col.lower()] = norm
+    finally:
+        conn.close()
+    return {'names': names, 'columns': columns, 'mappings': mappings,
+            'matcher': SupplierMatcher(names),
+            'fingerprints': {}}  # supplier -> hash of its mappings, filled by rules_fingerprint
+
+def _load_filter_rules(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT col_name, raw_value FROM data_filter")
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    filter_dict = {}
+    for col, raw in rows:
+        filter_dict.setdefault(col.lower(), set()).add(raw.lower())
+    return filter_dict
+
+def get_supplier_rules(db_path=None):
+    """Supplier names, header columns and rename mappings from DB_PATH (cached)"""
+    return _cached_rules('supplier', db_path or DB_PATH, _load_supplier_rules)
+
+def get_filter_rules(db_path=None):
+    """{column: allowed lowercase values} from data_filter (cached)"""
+    return _cached_rules('filter', db_path or FILTER_DB_PATH, _load_filter_rules)
 
-def load_mappings_from_db(name):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT col_name, norm_col_name FROM {TABLE_NAME} WHERE LOWER(name)=?", (name.lower(),))
-    mappings = {col.lower(): norm for col, norm in cursor.fetchall()}
-    conn.close()
+def clear_rule_cache():
+    with rule_cache_lock:
+        rule_cache.clear()
+
+def load_mappings_from_db(name, db_path=None):
+    mappings = get_supplier_rules(db_path)['mappings'].get(name.lower(), {})
     log(f"🗺️ Loaded mappings for supplier: {name} → {len(mappings)} columns")
     return mappings
 
-def get_db_column_names(name):
+def get_db_column_names(name, db_path=None):
     """Get all column names from database for header detection"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT col_name FROM {TABLE_NAME} WHERE LOWER(name)=?", (name.lower(),))
-    col_names = [row[0].lower().strip() for row in cursor.fetchall()]
-    conn.close()
-    return col_names
-
-def detect_header_row_from_db(file_path, name):
+    return get_supplier_rules(db_path)['columns'].get(name.lower(), [])
+
+def rows_to_dataframe(rows, header_row, chunk_size=None, positions=None):
+    """Build a dataframe from a row iterator, chunk_size rows at a time.
+
+    With positions, only those columns of header_row are materialized.
+    """
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    width = len(header_row)
+    pick = None
+    if positions is not None:
+        columns = [header_row[pos] for pos in positions]
+        if len(positions) == 1:
+            pos = positions[0]
+            pick = lambda row: (row[pos],)
+        elif positions:
+            pick = operator.itemgetter(*positions)
+        else:
+            pick = lambda row: ()
+    else:
+        columns = header_row
+    frames = []
+    chunk = []
+    for row in rows:
+        if row is None:
+            continue
+        if len(row) != width:  # ragged csv rows
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+        chunk.append(row if pick is None else pick(row))
+        if len(chunk) >= chunk_size:
+            frames.append(pd.DataFrame(chunk, columns=columns))
+            chunk = []
+    if chunk:
+        frames.append(pd.DataFrame(chunk, columns=columns))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+def normalized_columns(name, mappings):
+    """Lower-cased column names, after renaming, that normalize_file keeps"""
+    keep = {col.lower() for col in REQUIRED_HEADERS}
+    for (supplier, norm_col), rule in MEASUREMENT_RULES.items():
+        if supplier.lower() == name.lower() and keep & {col.lower() for col in rule['new_cols']}:
+            keep.add(norm_col.lower())
+    return frozenset(keep)
+
+def projected_positions(header_row, projection):
+    """Positions in header_row whose renamed column survives; projection is
+    (mappings, kept names) or None for every column"""
+    if projection is None:
+        return None
+    mappings, keep = projection
+    return [pos for pos, col in enumerate(header_row)
+            if mappings.get(col.lower(), col).lower() in keep]
+
+def sheet_frame(rows, header_row, projection):
+    """rows_to_dataframe under a column projection; df.attrs['cells_skipped']
+    counts the cells left unbuilt"""
+    positions = projected_positions(header_row, projection)
+    df = rows_to_dataframe(rows, header_row, positions=positions)
+    if positions is not None:
+        df.attrs['cells_skipped'] = len(df) * (len(header_row) - len(positions))
+    return df
+
+def combine_sheet_frames(dataframes):
+    """Concat per-sheet frames, carrying over the projection's skipped cell count"""
+    skipped = sum(df.attrs.pop('cells_skipped', 0) for df in dataframes)
+    combined_df = pd.concat(dataframes, ignore_index=True)
+    combined_df.attrs = {'cells_skipped': skipped} if skipped else {}
+    return combined_df
+
+def sheet_too_narrow(sheet, min_columns):
+    """True when the sheet dimensions say no row can hold min_columns values"""
+    max_column = sheet.max_column
+    return max_column is not None and max_column < min_columns
+
+def _fuzzy_header_hits(values, db_column_set):
+    """Cell texts that are near-misses of a DB column name (HEADER_FUZZY_THRESHOLD)"""
+    if HEADER_FUZZY_THRESHOLD is None or len(values) == 0 or not db_column_set:
+        return set()
+    scores = process.cdist(list(values), list(db_column_set), scorer=fuzz.ratio)
+    return {val for val, best in zip(values, scores.max(axis=1)) if best >= HEADER_FUZZY_THRESHOLD}
+
+def score_header_rows(window, db_column_set):
+    """Pick the header among the leading rows of a sheet.
+
+    All rows are scored at once: a cell matches when its stripped, lower-cased
+    text is in db_column_set (or a fuzzy near-miss). Rows with fewer than 3
+    values or under HEADER_MATCH_RATIO are ignored; the highest ratio wins,
+    then the most matches, then the earliest row. Returns
+    (index, matches, non_empty, ratio) or None.
+    """
+    if not window:
+        return None
+    cells = pd.DataFrame([row if row is not None else () for row in window], dtype=object)
+    if cells.empty:
+        return None
+    text = cells.astype(str).apply(lambda col: col.str.strip().str.lower())
+    non_empty = cells.notna().to_numpy() & (text != '').to_numpy()
+    matched = text.isin(db_column_set).to_numpy()
+
+    unmatched = text.to_numpy()[non_empty & ~matched]
+    fuzzy_hits = _fuzzy_header_hits(pd.unique(unmatched), db_column_set)
+    if fuzzy_hits:
+        matched |= text.isin(fuzzy_hits).to_numpy()
+    matched &= non_empty
+
+    counts = non_empty.sum(axis=1)
+    matches = matched.sum(axis=1)
+    ratios = np.divide(matches, counts, out=np.zeros(len(counts)), where=counts > 0)
+    eligible = (counts >= 3) & (ratios >= HEADER_MATCH_RATIO)
+    if not eligible.any():
+        return None
+    # Highest ratio first, then most matches, then the earliest row
+    order = np.lexsort((-np.arange(len(ratios)), matches, np.where(eligible, ratios, -1.0)))
+    i = int(order[-1])
+    return i, int(matches[i]), int(counts[i]), float(ratios[i])
+
+def _sheet_with_db_header(sheet, db_column_set, projection=None):
+    """One sheet's dataframe below the best DB-matched header row, or None"""
+    log(f"🧪 Scanning sheet: {sheet.title}")
+    if sheet_too_narrow(sheet, 3):
+        log(f"⏭️ Skipping sheet {sheet.title}: fewer than 3 columns")
+        return None
+
+    rows = sheet.iter_rows()
+    header_row = None
+    
+    # Score the first HEADER_SCAN_ROWS rows together and take the best one
+    window = list(itertools.islice(rows, HEADER_SCAN_ROWS))
+    best = score_header_rows(window, db_column_set)
+    if best is not None:
+        i, matches, non_empty, match_ratio = best
+        header_row = [str(cell).strip() if cell is not None else "" for cell in window[i]]
+        log(f"✅ Found header row at index {i} with {matches}/{non_empty} matches ({match_ratio:.1%})")
+        rows = itertools.chain(window[i + 1:], rows)
+    
+    if header_row:
+        # Stream the remaining rows straight into the dataframe
+        df = sheet_frame(rows, header_row, projection)
+        if len(df):
+            log(f"📊 Created dataframe for sheet: {sheet.title} with shape {df.shape}")
+            return df
+    else:
+        log(f"⏭️ No header in first {HEADER_SCAN_ROWS} rows of sheet: {sheet.title}")
+    return None
+
+def _sheet_with_dense_header(sheet, min_non_na, projection=None):
+    """One sheet's dataframe below its first row with min_non_na leading values, or None"""
+    log(f"🧪 Scanning sheet: {sheet.title}")
+    if sheet_too_narrow(sheet, min_non_na):
+        log(f"⏭️ Skipping sheet {sheet.title}: fewer than {min_non_na} columns")
+        return None
+
+    rows = sheet.iter_rows()
+    header_row = None
+
+    for i, row in enumerate(rows):
+        if i >= HEADER_SCAN_ROWS:
+            break
+        if row is None:
+            continue
+        if sum(cell is not None for cell in row[:min_non_na]) >= min_non_na:
+            header_row = [str(cell).strip() if cell is not None else "" for cell in row]
+            log(f"✅ Detected header row: {header_row}")
+            break
+
+    if header_row:
+        df = sheet_frame(rows, header_row, projection)
+        if len(df):
+            log(f"📊 Created dataframe for sheet: {sheet.title} with shape {df.shape}")
+            return df
+    return None
+
+SHEET_PARSERS = {
+    'db_header': _sheet_with_db_header,
+    'dense_header': _sheet_with_dense_header,
+}
+
+def _parse_sheets_in_worker(file_path, indices, parser, arg, projection=None):
+    """Sheet-pool entry point: open a handle of our own and parse a run of sheets"""
+    with readers.open_workbook(file_path, READER_ENGINE) as wb:
+        frames = [SHEET_PARSERS[parser](wb.worksheets[index], arg, projection) for index in indices]
+    return frames, _drain_worker_logs()
+
+def _parallel_sheets_worthwhile(file_path):
+    try:
+        return SHEET_PROCESSES >= 2 and os.path.getsize(file_path) >= SHEET_PARALLEL_MIN_BYTES
+    except OSError:
+        return False
+
+def sheet_readers(file_path):
+    """How many processes may hold file_path's workbook at once (1 unless its
+    sheets can be parsed in parallel); known before the sheets are counted.
+    In a pool worker the dispatcher's grant for this file caps it."""
+    if not _parallel_sheets_worthwhile(file_path):
+        return 1
+    if sheet_process_grant is not None:
+        return max(min(SHEET_PROCESSES, sheet_process_grant), 1)
+    return SHEET_PROCESSES
+
+def idle_sheet_processes(file_path):
+    """Sheet processes the pool can spare for file_path as it's dispatched:
+    the cores no other in-flight or waiting file will take. While files keep
+    coming that's 1 (parse in the worker); a big file on its own gets all
+    SHEET_PROCESSES."""
+    if not _parallel_sheets_worthwhile(file_path):
+        return 1
+    with session_lock:
+        others = len(pending_files)
+    others = min(others + file_queue.qsize(), WORKER_PROCESSES - 1)
+    return max(min(SHEET_PROCESSES, (os.cpu_count() or 1) - others), 1)
+
+def _parallel_sheet_count(file_path, sheet_count):
+    """Processes to parse file_path's sheets with; 0 keeps them in this thread"""
+    processes = sheet_readers(file_path)
+    if processes < 2 or sheet_count < 2:
+        return 0
+    return min(processes, sheet_count)
+
+def read_sheets(file_path, parser, arg, projection=None):
+    """Run SHEET_PARSERS[parser](sheet, arg, projection) over every sheet; frames in sheet order.
+
+    Large multi-sheet workbooks are split across a pool of SHEET_PROCESSES
+    processes, each opening its own read-only handle, so one huge file
+    doesn't parse its sheets one after another.
+    """
+    wb = readers.open_workbook(file_path, READER_ENGINE)
+    log(f"📖 Reading {os.path.basename(file_path)} with {wb.engine}")
+    try:
+        sheet_count = len(wb.worksheets)
+        processes = _parallel_sheet_count(file_path, sheet_count)
+        if not processes:
+            frames = [SHEET_PARSERS[parser](sheet, arg, projection) for sheet in wb.worksheets]
+    finally:
+        wb.close()
+
+    if processes:
+        # Contiguous runs of sheets, so each process opens the workbook (and
+        # parses its shared strings) once and the frames come back in order
+        runs = [list(run) for run in np.array_split(np.arange(sheet_count), processes)]
+        log(f"🧵 Parsing {sheet_count} sheets of {os.path.basename(file_path)} in {processes} processes")
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_pool_worker,
+            initargs=(_worker_config(),),
+        ) as pool:
+            futures = [pool.submit(_parse_sheets_in_worker, file_path, [int(i) for i in run],
+                                   parser, arg, projection)
+                       for run in runs]
+            frames = []
+            for future in futures:
+                run_frames, messages = future.result()
+                for msg in messages:
+                    log(msg)
+                frames.extend(run_frames)
+    return [df for df in frames if df is not None]
+
+def detect_header_row_from_db(file_path, name, projection=None):
     """Enhanced header detection using database column names"""
-    wb = load_workbook(file_path, read_only=True, data_only=True)
-    db_columns = get_db_column_names(name)
+    db_columns = get_db_column_names(name, rule_db_paths(file_path)[0])
     
     if not db_columns:
         log(f"❌ No column names found in DB for supplier: {name}")
         return pd.DataFrame()
     
     log(f"🔍 Looking for header row using DB columns: {db_columns}")
-    
-    dataframes = []
-    for sheet in wb.worksheets:
-        log(f"🧪 Scanning sheet: {sheet.title}")
-        rows = list(sheet.iter_rows(values_only=True))
-        
-        header_row_idx = None
-        header_row = None
-        
-        # Look for header row by matching with database column names
-        for i, row in enumerate(rows):
-            if row is None:
-                continue
-                
-            # Clean and normalize row values
-            row_values = [str(cell).strip().lower() if cell is not None else "" for cell in row]
-            non_empty_values = [val for val in row_values if val]
-            
-            if len(non_empty_values) < 3:  # Skip rows with too few values
-                continue
-            
-            # Count matches with database columns
-            matches = 0
-            for val in non_empty_values:
-                if val in db_columns:
-                    matches += 1
-            
-            # If we find a good match ratio, this is likely the header
-            match_ratio = matches / len(non_empty_values) if non_empty_values else 0
-            if match_ratio >= 0.3:  # At least 30% of columns match DB
-                header_row_idx = i
-                header_row = [str(cell).strip() if cell is not None else "" for cell in row]
-                log(f"✅ Found header row at index {i} with {matches}/{len(non_empty_values)} matches ({match_ratio:.1%})")
-                break
-        
-        if header_row_idx is not None and header_row:
-            # Extract data rows after header
-            data_rows = []
-            for j in range(header_row_idx + 1, len(rows)):
-                if rows[j] is not None:
-                    data_rows.append(rows[j])
-            
-            if data_rows:
-                df = pd.DataFrame(data_rows, columns=header_row)
-                log(f"📊 Created dataframe for sheet: {sheet.title} with shape {df.shape}")
-                dataframes.append(df)
+    dataframes = read_sheets(file_path, 'db_header', set(db_columns), projection)
     
     if dataframes:
-        combined_df = pd.concat(dataframes, ignore_index=True)
+        combined_df = combine_sheet_frames(dataframes)
         log(f"📊 Combined dataframe shape: {combined_df.shape}")
         return combined_df
     else:
         log(f"❌ No valid header rows found in {file_path}")
         return pd.DataFrame()
 
-def read_excel_safely(file_path, min_non_na=5):
+def read_excel_safely(file_path, min_non_na=5, projection=None):
     """Fallback method - kept for compatibility"""
-    wb = load_workbook(file_path, read_only=True, data_only=True)
-    dataframes = []
-
-    for sheet in wb.worksheets:
-        log(f"🧪 Scanning sheet: {sheet.title}")
-        rows = sheet.iter_rows(values_only=True)
-        header_row = None
-        data_rows = []
-
-        for i, row in enumerate(rows):
-            if row is None:
-                continue
-            if header_row is None and sum(cell is not None for cell in row[:min_non_na]) >= min_non_na:
-                header_row = [str(cell).strip() if cell is not None else "" for cell in row]
-                log(f"✅ Detected header row: {header_row}")
-            elif header_row:
-                data_rows.append(row)
-
-        if header_row and data_rows:
-            df = pd.DataFrame(data_rows, columns=header_row)
-            log(f"📊 Created dataframe for sheet: {sheet.title} with shape {df.shape}")
-            dataframes.append(df)
+    dataframes = read_sheets(file_path, 'dense_header', min_non_na, projection)
 
     if dataframes:
-        return pd.concat(dataframes, ignore_index=True)
+        return combine_sheet_frames(dataframes)
     else:
         log(f"❌ No valid sheets found in {file_path}")
         return pd.DataFrame()
 
-def split_measurement_columns(df, name):
-    rules = {
-        ('abc', 'Measurements'): { 
-            'pattern': 'a-b*c',
-            'new_cols': ['Min', 'Max', 'Height']
-        },
-        
-    }
+def _smallest_int_dtype(values, nullable):
+    lo, hi = values.min(), values.max()
+    for bits in (8, 16, 32):
+        info = np.iinfo(f'int{bits}')
+        if info.min <= lo and hi <= info.max:
+            return f'Int{bits}' if nullable else f'int{bits}'
+    return 'Int64' if nullable else 'int64'
+
+def optimize_column(col):
+    """Tighter dtype for one object column from openpyxl, or None to keep it.
+
+    One dtype per kind (Int64, float64, ...), whatever the values: a cleaned
+    frame goes to the merge output and every file has to match the schema
+    the first one opened. Narrower ints are only for frames held in memory
+    (shrink_held_frame).
+    """
+    kind = pd.api.types.infer_dtype(col, skipna=True)
+    if kind == 'integer':
+        return col.astype('Int64')
+    if kind == 'floating':
+        return col.astype('float64')
+    if kind == 'boolean':
+        return col.astype('boolean')
+    if kind == 'string':
+        unique = col.nunique(dropna=True)
+        if unique <= max(1, len(col) * CATEGORY_MAX_RATIO):
+            return col.astype('category')
+    return None
 
+def shrink_held_frame(df):
+    """Narrowest nullable int for each Int64 column of a frame waiting in memory"""
+    for pos in range(df.shape[1]):
+        col = df.iloc[:, pos]
+        if col.dtype == 'Int64':
+            present = col.dropna()
+            if not present.empty:
+                df.isetitem(pos, col.astype(_smallest_int_dtype(present.astype('int64'), True)))
+    return df
+
+def widen_for_merge(df):
+    """Undo shrink_held_frame: Int64 again, so every file matches the output schema"""
+    for pos in range(df.shape[1]):
+        if df.dtypes.iloc[pos] in ('Int8', 'Int16', 'Int32'):
+            df.isetitem(pos, df.iloc[:, pos].astype('Int64'))
+    return df
+
+def optimize_dtypes(df, label=''):
+    """Categorical low-cardinality text, downcast/nullable numbers; logs memory saved"""
+    if not OPTIMIZE_DTYPES or df.empty:
+        return df
+    before = df.memory_usage(deep=True).sum()
+    for pos in range(df.shape[1]):
+        col = df.iloc[:, pos]
+        if col.dtype == object or isinstance(col.dtype, pd.StringDtype):
+            optimized = optimize_column(col)
+            if optimized is not None:
+                df.isetitem(pos, optimized)
+    after = df.memory_usage(deep=True).sum()
+    log(f"🗜️ Memory {label}: {before / 1024:,.0f} KB → {after / 1024:,.0f} KB")
+    return df
+
+def harmonize_categories(df, categories):
+    """Give categorical columns the session-wide category list so concat keeps them"""
+    with session_lock:
+        for pos in range(df.shape[1]):
+            col = df.iloc[:, pos]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                known = categories.setdefault(df.columns[pos], [])
+                seen = set(known)
+                known.extend(c for c in col.cat.categories if c not in seen)
+                df.isetitem(pos, col.cat.set_categories(known))
+    return df
+
+def align_session_categories(frames, session_categories):
+    """Re-apply the final session categories to frames harmonized earlier"""
+    with session_lock:
+        categories = {col: list(cats) for col, cats in session_categories.items()}
+    for df in frames:
+        for pos in range(df.shape[1]):
+            col = df.iloc[:, pos]
+            if isinstance(col.dtype, pd.CategoricalDtype) and df.columns[pos] in categories:
+                df.isetitem(pos, col.cat.set_categories(categories[df.columns[pos]]))
+    return frames
+
+# Measurement split rules: (supplier, normalized column) -> pattern + output columns.
+# In a pattern every letter is a number and every other character a separator,
+# so new layouts ('a*b-c', 'a/b/c', ...) only need a new entry here.
+MEASUREMENT_RULES = {
+    ('abc', 'Measurements'): {
+        'pattern': 'a-b*c',
+        'new_cols': ['Min', 'Max', 'Height']
+    },
+}
+
+_NUMBER_RE = r'\s*([+]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*'
+_measurement_regex_cache = {}
+
+def measurement_regex(pattern):
+    """Compile a rule pattern like 'a-b*c' into a regex with one group per letter"""
+    regex = _measurement_regex_cache.get(pattern)
+    if regex is None:
+        parts = [_NUMBER_RE if ch.isalpha() else re.escape(ch) for ch in pattern]
+        regex = re.compile('^' + ''.join(parts) + '$')
+        _measurement_regex_cache[pattern] = regex
+    return regex
+
+def split_measurement_columns(df, name):
     df.columns = [c.strip() for c in df.columns]
-    for (supplier, norm_col), rule in rules.items():
+    for (supplier, norm_col), rule in MEASUREMENT_RULES.items():
         match_col = next((col for col in df.columns if col.lower() == norm_col.lower()), None)
         if name.lower() == supplier.lower() and match_col:
-            def parse_expr(val):
-                try:
-                    val = str(val)
-                    if rule['pattern'] == 'a-b*c':
-                        a, rest = val.split('-')
-                        b, c = rest.split('*')
-                        return float(a), float(b), float(c)
-                    elif rule['pattern'] == 'a*b-c':
-                        a, rest = val.split('*')
-                        b, c = rest.split('-')
-                        return float(a), float(b), float(c)
-                except:
-                    return None, None, None
-
             new_cols = rule['new_cols']
-            df[new_cols] = df[match_col].apply(lambda x: pd.Series(parse_expr(x)))
+            # One regex pass over the whole column; rows that don't match become NaN
+            parts = df[match_col].astype(str).str.extract(measurement_regex(rule['pattern']))
+            values = parts.astype(float).to_numpy()
+            for i, new_col in enumerate(new_cols):
+                df[new_col] = values[:, i]
             df.drop(columns=[match_col], inplace=True)
 
     return df
 
-def apply_combined_filters(df, db_path='filter.db'):
-    log(f"🧽 Starting cleaning for file with shape: {df.shape}")
-    df.columns = [c.strip() for c in df.columns]
+FIXED_WHITELIST = {
+    'Color': {'red', 'blue', 'Green'},
+    
+}
 
-    FIXED_WHITELIST = {
-        'Color': {'red', 'blue', 'Green'},
-        
-    }
+def _whitelist_predicate(allowed_values):
+    allowed = {v.upper() for v in allowed_values}
+    return lambda values: values.str.strip().str.upper().isin(allowed)
 
-    for col, allowed_values in FIXED_WHITELIST.items():
-        match_col = next((c for c in df.columns if c.lower() == col.lower()), None)
-        if match_col:
-            df = df[df[match_col].astype(str).str.strip().str.upper().isin({v.upper() for v in allowed_values})]
-    log(f"🧼 After FIXED_WHITELIST, shape is: {df.shape}")
+def _db_filter_predicate(allowed_values):
+    return lambda values: values.str.lower().isin(allowed_values)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT col_name, raw_value FROM data_filter")
-    rows = cursor.fetchall()
-    conn.close()
+def compile_filter_plan(columns, filter_dict):
+    """Resolve every whitelist/DB filter against one column layout.
 
-    filter_dict = {}
-    for col, raw in rows:
-        filter_dict.setdefault(col.lower(), set()).add(raw.lower())
+    Returns [(position, [(stage, predicate), ...]), ...]: each referenced
+    column appears once, with all predicates that apply to it. Predicates
+    take the column's distinct string values and return a boolean array.
+    """
+    first_by_lower = {}
+    for pos, col in enumerate(columns):
+        first_by_lower.setdefault(col.lower(), pos)
+
+    plan = {}
+    for col, allowed_values in FIXED_WHITELIST.items():
+        pos = first_by_lower.get(col.lower())
+        if pos is not None:
+            plan.setdefault(pos, []).append(('whitelist', _whitelist_predicate(allowed_values)))
+    for col, allowed_values in filter_dict.items():
+        pos = first_by_lower.get(col)
+        if pos is not None:
+            plan.setdefault(pos, []).append(('db', _db_filter_predicate(allowed_values)))
+    return list(plan.items())
 
+def get_filter_plan(columns, db_path=None):
+    """Compiled plan for this column layout, cached per filter rules version"""
+    filter_dict = get_filter_rules(db_path)
+    key = (db_path or FILTER_DB_PATH, tuple(columns))
+    with rule_cache_lock:
+        entry = filter_plan_cache.get(key)
+        if entry is not None and entry[0] is filter_dict:
+            return filter_dict, entry[1]
+    plan = compile_filter_plan(columns, filter_dict)
+    with rule_cache_lock:
+        if len(filter_plan_cache) >= 256:
+            filter_plan_cache.clear()
+        filter_plan_cache[key] = (filter_dict, plan)
+    return filter_dict, plan
+
+def apply_combined_filters(df, db_path=None):
+    log(f"🧽 Starting cleaning for file with shape: {df.shape}")
+    df.columns = [c.strip() for c in df.columns]
+    filter_dict, plan = get_filter_plan(df.columns, db_path)
     log(f"🔍 DB-based filters loaded for columns: {list(filter_dict.keys())}")
-    for col in filter_dict:
-        match_col = next((c for c in df.columns if c.lower() == col), None)
-        if match_col:
-            df = df[df[match_col].astype(str).str.lower().isin(filter_dict[col])]
+
+    # Each referenced column is stringified and factorized once; predicates
+    # run on its distinct values and are looked up per row through the codes
+    stage_masks = {'whitelist': np.ones(len(df), dtype=bool), 'db': np.ones(len(df), dtype=bool)}
+    for pos, predicates in plan:
+        codes, uniques = pd.factorize(df.iloc[:, pos].astype(str))
+        values = pd.Series(uniques)
+        for stage, predicate in predicates:
+            # Extra False slot so missing values (code -1) never pass
+            allowed = np.append(np.asarray(predicate(values), dtype=bool), False)
+            stage_masks[stage] &= allowed[codes]
+
+    log(f"🧼 After FIXED_WHITELIST, shape is: {(int(stage_masks['whitelist'].sum()), df.shape[1])}")
+    df = df.take(np.flatnonzero(stage_masks['whitelist'] & stage_masks['db']))
     log(f"🧼 After DB filters, final shape: {df.shape}")
 
     return df
 
-def merge_session_files():
-    """Merge only files from current session using existing queues"""
-    log("🔗 Attempting to merge files from current session...")
+def add_cleaned_frame(file_path, df):
+    """Hand a cleaned file to its tenant's session merge (appended now in incremental mode)"""
+    tenant = tenant_of(file_path)
+    df = harmonize_categories(df, tenant.categories)
+    if MERGE_MODE != 'incremental':
+        df = shrink_held_frame(df)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with session_lock:
+            tenant.frames[file_path] = df
+            tenant.frame_bytes += nbytes
+            held = sum(t.frame_bytes for t in all_tenants())
+        budget = get_memory_budget()
+        if held + budget.reserved > budget.limit:
+            spill_session_frames()
+        return
+
+    if df.empty:
+        log(f"⚠️ Empty dataframe for: {os.path.basename(file_path)}")
+        journal_event('file_skipped', file_path, 'no rows left after cleaning')
+        return
+    with tenant.merge_lock:
+        try:
+            with metrics.span('merge', file_path, rows_in=len(df)):
+                if tenant.writer is None:
+                    tenant.writer = writers.RollingWriter(merged_output_path(tenant), OUTPUT_FORMAT)
+                rolled = tenant.writer.write(df)
+            if rolled:
+                log(f"🧩 Schema changed at {os.path.basename(file_path)}, continuing merge in "
+                    f"{tenant.writer.parts[-1]} (reconciled into one file when the session closes)")
+            tenant.merged.append(file_path)
+            journal_event('file_merged', file_path, tenant.writer.parts[-1])
+            log(f"✅ Appended to merge: {os.path.basename(file_path)} (shape: {df.shape})")
+        except Exception as e:
+            log(f"❌ Failed to append {file_path} to merge: {e}")
+
+def _spill_path(file_path):
+    digest = hashlib.sha1(f"{os.getpid()}:{file_path}".encode()).hexdigest()
+    return os.path.join(MERGE_SPILL_DIR, digest + '.pkl')
+
+def spill_session_frames():
+    """Move the batch merge inputs every tenant holds in memory to MERGE_SPILL_DIR"""
+    with session_lock:
+        in_memory = [(tenant, path, df) for tenant in all_tenants() for path, df in tenant.frames.items()
+                     if isinstance(df, pd.DataFrame) and not df.empty]
+    if not in_memory:
+        return
+    os.makedirs(MERGE_SPILL_DIR, exist_ok=True)
+    freed = 0
+    for tenant, file_path, df in in_memory:
+        spill_path = _spill_path(file_path)
+        df.to_pickle(spill_path)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with session_lock:
+            if tenant.frames.get(file_path) is df:
+                tenant.frames[file_path] = SpilledFrame(spill_path, df.shape, list(df.columns))
+                tenant.frame_bytes = max(tenant.frame_bytes - nbytes, 0)
+                freed += nbytes
+    metrics.incr('frames_spilled', len(in_memory))
+    log(f"💽 Memory budget exceeded, spilled {len(in_memory)} merge inputs "
+        f"({memory.format_bytes(freed)}) to {MERGE_SPILL_DIR}")
+
+def load_session_frame(frame):
+    """A session merge input, read back from disk if it was spilled"""
+    if isinstance(frame, SpilledFrame):
+        df = pd.read_pickle(frame.path)
+        try:
+            os.remove(frame.path)
+        except OSError:
+            pass
+        return df
+    return frame
+
+def discard_session_frames(frames):
+    for frame in frames:
+        if isinstance(frame, SpilledFrame):
+            try:
+                os.remove(frame.path)
+            except OSError:
+                pass
+
+def log_unreconciled(writer):
+    """Last resort: the merge parts couldn't be reconciled and stay split"""
+    if len(writer.parts) > 1:
+        log(f"🚨 Could not reconcile the merge into one file ({writer.reconcile_error}); "
+            f"output is split across {len(writer.parts)} files: {', '.join(writer.parts)}")
+
+def finalize_session_output(tenant=None):
+    """Close the tenant's incremental merge output; everything is already on disk"""
+    tenant = tenant or default_tenant
+    with tenant.merge_lock:
+        writer, merged = tenant.writer, list(tenant.merged)
+        tenant.writer = None
+        tenant.merged.clear()
+        with session_lock:
+            tenant.files.clear()
+            tenant.keys.clear()
+            tenant.categories.clear()
+    log_cache_stats()
+    log_memory_peak()
+
+    if writer is None:
+        log("⚠️ No valid dataframes found to merge from session files.")
+        return
+    try:
+        writer.close()
+        log_unreconciled(writer)
+        journal_event('merge_finished', merged, writer.parts[0] if len(writer.parts) == 1 else None)
+        names = [os.path.basename(path) for path in merged]
+        tenant.last_merge.update(paths=list(writer.parts), files=names, rows=writer.rows_written)
+        log(f"✅ Session merge completed{tenant_label(tenant)}! Final file: {', '.join(writer.parts)}")
+        log(f"📊 Merged {len(merged)} files with total shape: {(writer.rows_written, len(writer.columns))}")
+        log(f"📁 Files merged: {', '.join(names)}")
+    except Exception as e:
+        log(f"❌ Error during merge: {e}")
+
+@profiling.hot_path('merge')
+def merge_session_files(tenant=None):
+    """Merge only files from the tenant's current session using existing queues"""
+    tenant = tenant or default_tenant
+    log(f"🔗 Attempting to merge files from current session{tenant_label(tenant)}...")
     
+    if MERGE_MODE == 'incremental':
+        finalize_session_output(tenant)
+        return
+
     with session_lock:
-        if not session_files:
+        if not tenant.files:
             log("⚠️ No files in current session to merge.")
             return
         
-        session_files_copy = session_files.copy()
+        session_files_copy = tenant.files.copy()
+        session_frames_copy = dict(tenant.frames)
     
-    dataframes = []
+    frames = []
+    merged_paths = []
     successfully_merged = []
     
     for file_path in session_files_copy:
-        # Convert to normalized filename
-        normalized_file = os.path.splitext(file_path)[0] + '_normalized.xlsx'
-        
-        if os.path.exists(normalized_file):
-            try:
-                df = pd.read_excel(normalized_file)
-                if not df.empty:
-                    dataframes.append(df)
-                    successfully_merged.append(os.path.basename(file_path))
-                    log(f"✅ Added to merge: {os.path.basename(normalized_file)} (shape: {df.shape})")
-                else:
-                    log(f"⚠️ Empty dataframe in: {normalized_file}")
-            except Exception as e:
-                log(f"❌ Failed to read {normalized_file} for merge: {e}")
+        frame = session_frames_copy.get(file_path)
+        if frame is None:
+            log(f"⚠️ No cleaned data for: {os.path.basename(file_path)}")
+        elif frame.shape[0] == 0:
+            log(f"⚠️ Empty dataframe for: {os.path.basename(file_path)}")
+            journal_event('file_skipped', file_path, 'no rows left after cleaning')
         else:
-            log(f"⚠️ Normalized file not found: {normalized_file}")
+            frames.append(frame)
+            merged_paths.append(file_path)
+            successfully_merged.append(os.path.basename(file_path))
+            log(f"✅ Added to merge: {os.path.basename(file_path)} (shape: {frame.shape})")
 
-    if dataframes:
+    if frames:
         try:
-            final_df = pd.concat(dataframes, ignore_index=True)
-            final_df.to_excel(MERGED_OUTPUT_PATH, index=False)
-            log(f"✅ Session merge completed! Final file: {MERGED_OUTPUT_PATH}")
-            log(f"📊 Merged {len(successfully_merged)} files with total shape: {final_df.shape}")
+            # Union of columns in first-seen order, then append file by file,
+            # reading spilled frames back one at a time
+            columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+            output_path = merged_output_path(tenant)
+            with writers.RollingWriter(output_path, OUTPUT_FORMAT, columns=columns) as writer:
+                for frame in frames:
+                    df = align_session_categories([load_session_frame(frame)], tenant.categories)[0]
+                    writer.write(widen_for_merge(df))
+            log_unreconciled(writer)
+            journal_event('merge_finished', merged_paths, output_path if len(writer.parts) == 1 else None)
+            tenant.last_merge.update(paths=list(writer.parts), files=successfully_merged, rows=writer.rows_written)
+            log(f"✅ Session merge completed{tenant_label(tenant)}! Final file: {', '.join(writer.parts)}")
+            log(f"📊 Merged {len(successfully_merged)} files with total shape: {(writer.rows_written, len(columns))}")
             log(f"📁 Files merged: {', '.join(successfully_merged)}")
             
+            log_cache_stats()
+            log_memory_peak()
+            
             # Clear session files after successful merge
             with session_lock:
-                session_files.clear()
+                tenant.files.clear()
+                tenant.frames.clear()
+                tenant.frame_bytes = 0
+                tenant.keys.clear()
+                tenant.categories.clear()
                 
         except Exception as e:
             log(f"❌ Error during merge: {e}")
     else:
         log("⚠️ No valid dataframes found to merge from session files.")
 
-def detect_header_and_normalize(file_path):
-    # Add to session tracking
-    with session_lock:
-        session_files.add(file_path)
-    
-    name_key = get_name_from_filename(os.path.basename(file_path))
+REQUIRED_HEADERS = ['color']  # Normalized columns a cleaned file keeps
+
+def log_projection_savings(file_path, df, stage):
+    """Log the cells (and, estimated from the kept ones, bytes) projection skipped"""
+    cells = df.attrs.pop('cells_skipped', 0)
+    if not cells:
+        return
+    kept_cells = df.shape[0] * df.shape[1]
+    nbytes = None
+    if kept_cells:
+        nbytes = int(df.memory_usage(deep=True, index=False).sum() / kept_cells * cells)
+    stage['cells_skipped'] = cells
+    metrics.incr('cells_skipped', cells)
+    log(f"✂️ Column projection skipped {cells:,} cells (~{memory.format_bytes(nbytes)}) "
+        f"of {os.path.basename(file_path)}")
+
+@profiling.hot_path('normalize')
+def normalize_file(file_path):
+    """Read, rename and project one workbook; returns None when it can't be used"""
+    db_path = rule_db_paths(file_path)[0]
+    name_key = get_name_from_filename(os.path.basename(file_path), db_path)
     if name_key is None:
         log(f"❌ Skipping file: No valid mapping found for '{file_path}'")
-        return
+        return None
 
-    # Use enhanced header detection
-    df = detect_header_row_from_db(file_path, name_key)
-    
-    # Fallback to old method if new method fails
-    if df.empty:
-        log(f"⚠️ DB-based header detection failed, falling back to old method")
-        df = read_excel_safely(file_path)
+    mappings = load_mappings_from_db(name_key, db_path)
+    projection = column_projection(name_key, mappings)
+
+    with metrics.span('header_detection', file_path) as stage:
+        # Use enhanced header detection
+        df = detect_header_row_from_db(file_path, name_key, projection)
+
+        # Fallback to old method if new method fails
+        if len(df) == 0:
+            log(f"⚠️ DB-based header detection failed, falling back to old method")
+            df = read_excel_safely(file_path, projection=projection)
+        stage['bytes'] = os.path.getsize(file_path)
+        stage['rows_out'] = len(df)
+        log_projection_savings(file_path, df, stage)
     
-    if df.empty:
+    if len(df) == 0:
         log(f"❌ Could not read any data from {file_path}")
-        return
+        return None
 
-    mappings = load_mappings_from_db(name_key)
+    with metrics.span('normalize', file_path, rows_in=len(df)) as stage:
+        df = optimize_dtypes(df, os.path.basename(file_path))
+        log(f"⚙️ Normalizing file: {file_path}")
+        df = rename_columns(df, mappings)
+        df = split_measurement_columns(df, name_key)
+        df = keep_required_columns(df)
+        stage['rows_out'] = len(df)
+
+    if PERSIST_INTERMEDIATES:
+        output_path = normalized_path(file_path)
+        writers.write_frame(output_path, df, INTERMEDIATE_FORMAT)
+        log(f"✅ Normalized file saved to: {output_path}")
+
+    return df
+
+def column_projection(name, mappings):
+    """What to pass detect_header_row_from_db as projection: columns renamed to
+    anything normalization drops are never built (None = build them all)"""
+    return (mappings, normalized_columns(name, mappings)) if COLUMN_PROJECTION else None
+
+def rename_columns(df, mappings):
+    """Strip the headers and rename them with the supplier's mappings"""
     df.columns = [c.strip() for c in df.columns]
-    log(f"⚙️ Normalizing file: {file_path}")
     log(f"🧾 Columns before rename: {list(df.columns)}")
     df.rename(columns=lambda col: mappings.get(col.lower(), col), inplace=True)
     log(f"🧾 Columns after rename: {list(df.columns)}")
-    df = split_measurement_columns(df, name_key)
+    return df
 
-    required_headers = ['color']
-    required_lower = {h.lower() for h in required_headers}
-    df = df[[col for col in df.columns if col.lower() in required_lower]]
+def keep_required_columns(df):
+    """Only the REQUIRED_HEADERS columns"""
+    required_lower = {h.lower() for h in REQUIRED_HEADERS}
+    return df[[col for col in df.columns if col.lower() in required_lower]]
 
-    output_path = os.path.splitext(file_path)[0] + '_normalized.xlsx'
-    df.to_excel(output_path, index=False)
-    log(f"✅ Normalized file saved to: {output_path}")
+def detect_header_and_normalize(file_path, cache_key=None):
+    # Add to session tracking
+    with session_lock:
+        tenant_of(file_path).files.add(file_path)
+    
+    df = normalize_file(file_path)
+    if df is None:
+        journal_event('file_skipped', file_path, 'no supplier mapping or no readable data')
+        return False
 
     processed_files.add(file_path)
-    preprocessing_queue.put(output_path)
-    log(f"📥 Added to preprocessing queue: {output_path}")
+    queued_at[file_path] = time.perf_counter()
+    preprocessing_queue.put((file_path, df, cache_key))
+    log(f"📥 Added to preprocessing queue: {file_path} (shape: {df.shape})")
+    return True
+
+def file_content_hash(file_path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _supplier_fingerprint(supplier_rules, supplier):
+    """Hash of one supplier's mappings, computed once per loaded rules"""
+    key = supplier.lower() if supplier else None
+    fingerprints = supplier_rules['fingerprints']
+    if key not in fingerprints:
+        mapping = supplier_rules['mappings'].get(key, {})
+        fingerprints[key] = hashlib.sha256(repr(sorted(mapping.items())).encode()).hexdigest()
+    return fingerprints[key]
+
+def _filter_fingerprint(filter_rules):
+    """Hash of the filter values, computed once per loaded rules"""
+    with rule_cache_lock:
+        entry = filter_fingerprints.get(id(filter_rules))
+    if entry is not None and entry[0] is filter_rules:
+        return entry[1]
+    fingerprint = hashlib.sha256(
+        repr(sorted((col, sorted(values)) for col, values in filter_rules.items())).encode()).hexdigest()
+    with rule_cache_lock:
+        # Only the rules objects still cached can come back
+        live = {id(entry[2]) for entry in rule_cache.values()}
+        for stale in [key for key in filter_fingerprints if key not in live]:
+            del filter_fingerprints[stale]
+        filter_fingerprints[id(filter_rules)] = (filter_rules, fingerprint)
+    return fingerprint
+
+def rules_fingerprint(db_path=None, filter_db_path=None, supplier=None):
+    """Hash of every rule that shapes a cleaned file of supplier, so editing
+    another supplier's mappings keeps this one's cache entries valid"""
+    digest = hashlib.sha256()
+    digest.update(_supplier_fingerprint(get_supplier_rules(db_path), supplier).encode())
+    digest.update(_filter_fingerprint(get_filter_rules(filter_db_path)).encode())
+    digest.update(repr(MEASUREMENT_RULES).encode())
+    digest.update(repr(sorted((col, sorted(values)) for col, values in FIXED_WHITELIST.items())).encode())
+    digest.update(repr([(name, globals()[name]) for name in CACHE_KEY_SETTINGS]).encode())
+    digest.update(str(CACHE_FORMAT_VERSION).encode())
+    return digest.hexdigest()
+
+def processing_cache_key(file_path):
+    # The supplier comes from the filename, so identical bytes under another
+    # supplier's name must not share a result
+    db_path, filter_db_path = rule_db_paths(file_path)
+    supplier = get_supplier_rules(db_path)['matcher'].match(clean_filename(file_path)[1])[0]
+    fingerprint = rules_fingerprint(db_path, filter_db_path, supplier)
+    return hashlib.sha256(f"{file_content_hash(file_path)}:{supplier}:{fingerprint}".encode()).hexdigest()
+
+def _cache_entry_path(cache_key):
+    return os.path.join(CACHE_DIR, cache_key + '.pkl')
+
+def load_cached_result(cache_key):
+    """Cleaned dataframe for cache_key, or None on a miss"""
+    path = _cache_entry_path(cache_key)
+    try:
+        df = pd.read_pickle(path)
+        os.utime(path)  # Mark as recently used for LRU eviction
+        return df
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def store_cached_result(cache_key, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_entry_path(cache_key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    evict_processing_cache()
+
+def evict_processing_cache(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+    except OSError:
+        return
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def lookup_cached_result(file_path):
+    """(cache_key, cached df or None); the key is None when the cache is off"""
+    with metrics.span('cache_lookup', file_path) as stage:
+        cache_key = processing_cache_key(file_path) if PROCESSING_CACHE else None
+        df = load_cached_result(cache_key) if cache_key else None
+        stage['hit'] = df is not None
+    return cache_key, df
+
+@profiling.hot_path('filter')
+def filter_file(file_path, df):
+    """apply_combined_filters, timed as the file's filter stage"""
+    with metrics.span('filter', file_path, rows_in=len(df)) as stage:
+        df = apply_combined_filters(df, rule_db_paths(file_path)[1])
+        stage['rows_out'] = len(df)
+    return df
+
+def process_file_cached(file_path):
+    """Normalize + clean one file, served from the processing cache when possible.
+
+    Returns (df, cache_key, cache_hit); df is None when the file can't be used.
+    """
+    cache_key, df = lookup_cached_result(file_path)
+    if df is not None:
+        log(f"💾 Cache hit for {os.path.basename(file_path)}")
+        return df, cache_key, True
+
+    df = normalize_file(file_path)
+    if df is not None:
+        df = filter_file(file_path, df)
+        if cache_key:
+            store_cached_result(cache_key, df)
+    return df, cache_key, False
+
+def accept_cleaned_file(file_path, df, cache_key=None, cache_hit=False):
+    """Record cache stats, drop same-content duplicates, then hand df to the merge"""
+    if cache_key:
+        with counter_lock:
+            cache_stats['hits' if cache_hit else 'misses'] += 1
+        with session_lock:
+            keys = tenant_of(file_path).keys
+            duplicate_of = keys.get(cache_key)
+            if duplicate_of is None:
+                keys[cache_key] = os.path.basename(file_path)
+        if duplicate_of is not None:
+            log(f"♊ Skipping {os.path.basename(file_path)}: same content as {duplicate_of}")
+            journal_event('file_skipped', file_path, f"same content as {duplicate_of}")
+            processed_files.add(file_path)
+            return
+    # Absolute, so a resume from another working directory still finds it
+    result_path = os.path.abspath(_cache_entry_path(cache_key)) if cache_key and PROCESSING_CACHE else None
+    journal_event('file_cleaned', file_path, cache_key, result_path, len(df))
+    add_cleaned_frame(file_path, df)
+    processed_files.add(file_path)
+    metrics.incr('files_cleaned')
+    metrics.incr('rows_cleaned', len(df))
+
+def log_cache_stats():
+    if PROCESSING_CACHE:
+        with counter_lock:
+            hits, misses = cache_stats['hits'], cache_stats['misses']
+        log(f"💾 Processing cache: {hits} hits / {misses} misses")
+
+def get_memory_budget():
+    """The shared MemoryBudget, rebuilt when MEMORY_BUDGET changes while idle"""
+    global memory_budget
+    limit = MEMORY_BUDGET or (memory.physical_memory() or 8 * 1024 ** 3) // 2
+    with session_lock:
+        if memory_budget is None or (memory_budget.limit != limit and memory_budget.reserved == 0):
+            memory_budget = memory.MemoryBudget(limit)
+        return memory_budget
+
+def reserve_memory(file_path, readers=None):
+    """Block until file_path's estimated footprint fits the memory budget"""
+    budget = get_memory_budget()
+    # Every sheet process opens (and holds) its own copy of the workbook
+    need = memory.estimate_footprint(file_path) * (readers or sheet_readers(file_path))
+    if not budget.fits(need):
+        log(f"⏳ Memory budget full ({memory.format_bytes(budget.reserved)} of "
+            f"{memory.format_bytes(budget.limit)} reserved), holding: {os.path.basename(file_path)}")
+    nbytes = budget.acquire(need)
+    with session_lock:
+        memory_reservations[file_path] = (budget, nbytes)
+
+def release_memory(file_path):
+    with session_lock:
+        entry = memory_reservations.pop(file_path, None)
+    if entry is not None:
+        entry[0].release(entry[1])
+
+def note_worker_rss(rss):
+    global worker_peak_rss
+    if rss is not None:
+        with session_lock:
+            worker_peak_rss = max(worker_peak_rss or 0, rss)
+
+def log_memory_peak():
+    budget = get_memory_budget()
+    log(f"🧠 Peak memory: RSS {memory.format_bytes(memory.peak_rss())}"
+        + (f", largest worker {memory.format_bytes(worker_peak_rss)}" if WORKER_PROCESSES > 0 else "")
+        + f"; budget peak {memory.format_bytes(budget.peak)} of {memory.format_bytes(budget.limit)}"
+        + f" ({budget.waits} waits)")
+
+def enqueue_file(file_path):
+    """Intake: count the file as outstanding for its tenant, then queue it for normalization"""
+    tenant = tenant_of(file_path)
+    with outstanding_cond:
+        tenant.outstanding += 1
+    metrics.incr('files_enqueued')
+    if file_path not in processed_files:
+        journal_event('file_queued', file_path)
+    queued_at[file_path] = time.perf_counter()
+    file_queue.put(file_path)
+
+def get_journal():
+    """The shared JobJournal, or None when JOURNAL_ENABLED is off"""
+    global job_journal
+    if not JOURNAL_ENABLED:
+        return None
+    path = JOURNAL_DB_PATH or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'jobs.db')
+    with session_lock:
+        if job_journal is None or job_journal.db_path != path:
+            if job_journal is not None:
+                job_journal.close()
+            job_journal = journal.JobJournal(path)
+        return job_journal
+
+def journal_event(event, *args):
+    """Record a stage change (a JobJournal method name); journal errors never stop a file"""
+    jobs = get_journal()
+    if jobs is None:
+        return
+    try:
+        getattr(jobs, event)(*args)
+    except sqlite3.Error as e:
+        log(f"⚠️ Job journal {event} failed: {e}")
+
+def _load_journaled_result(result_path):
+    try:
+        return pd.read_pickle(result_path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def resume_jobs(paths=None, stages=journal.UNFINISHED):
+    """Pick up the files a crash or stop left unfinished; returns how many.
+
+    Only those in paths, or when None the ones in the watched folders, so a
+    watcher never picks up another run's files (jobs.db is shared).
+
+    Files cleaned before the stop whose result is still in the processing
+    cache (and whose bytes are unchanged) go straight to the merge; all others
+    are queued again. Appends to an output that was never finalized are
+    redone into the new one. Pass stages with 'done' as well to merge
+    finished files again, e.g. when the output is rewritten from scratch.
+    Call once the pipeline threads/pool are running.
+    """
+    jobs = get_journal()
+    if jobs is None:
+        return 0
+    try:
+        unfinished = jobs.unfinished(stages)
+    except sqlite3.Error as e:
+        log(f"⚠️ Could not read the job journal: {e}")
+        return 0
+
+    wanted = None if paths is None else set(paths)
+    ready, requeue = [], []
+    for path, stage, size, mtime_ns, cache_key, result_path in unfinished:
+        if path in processed_files:
+            continue
+        if wanted is None and not in_watched_folder(path):
+            continue
+        if wanted is not None and path not in wanted:
+            continue
+        try:
+            unchanged = _file_signature(path) == (size, mtime_ns)
+        except OSError:
+            journal_event('file_failed', path, 'file no longer exists')
+            continue
+        if stage != 'queued' and unchanged and result_path and os.path.exists(result_path):
+            ready.append((path, cache_key, result_path))
+        else:
+            requeue.append(path)
+    if not ready and not requeue:
+        return 0
+    log(f"⏯️ Resuming {len(ready) + len(requeue)} files from the job journal "
+        f"({len(ready)} already cleaned)")
+
+    # Count the cleaned files first so the merge waits for every one of them
+    with outstanding_cond:
+        for path, _, _ in ready:
+            tenant_of(path).outstanding += 1
+    for path in requeue:
+        enqueue_file(path)
+    for path, cache_key, result_path in ready:
+        df = _load_journaled_result(result_path)
+        if df is None:
+            enqueue_file(path)
+        else:
+            with session_lock:
+                tenant_of(path).files.add(path)
+            accept_cleaned_file(path, df, cache_key, cache_hit=True)
+        file_finished(path)
+    return len(ready) + len(requeue)
+
+def record_queue_wait(stage, file_path):
+    """Span for the time file_path sat in the queue it was just taken from"""
+    entered = queued_at.pop(file_path, None)
+    if entered is not None:
+        metrics.record_span(stage, file_path, time.perf_counter() - entered)
+
+def file_finished(file_path):
+    """A file left the pipeline (cleaned, skipped or failed).
+
+    Its tenant's session merge runs exactly when the tenant's last
+    outstanding file finishes, so it can't fire while another stage is still
+    holding one of its files, and other tenants' backlogs don't delay it.
+    """
+    file_queue.done(file_path)
+    metrics.incr('files_finished')
+    release_outstanding(tenant_of(file_path))
+
+@contextmanager
+def holding_session(tenant=None):
+    """Keep the tenant's session open (no merge) until the block is done,
+    e.g. while a batch is still being resumed and enqueued"""
+    tenant = tenant or default_tenant
+    with outstanding_cond:
+        tenant.outstanding += 1
+    try:
+        yield tenant
+    finally:
+        release_outstanding(tenant)
+
+def release_outstanding(tenant):
+    """Drop one outstanding count; the last one runs the tenant's session merge"""
+    with outstanding_cond:
+        tenant.outstanding = max(tenant.outstanding - 1, 0)
+        idle = tenant.outstanding == 0
+        if idle:
+            tenant.merges_running += 1
+    if not idle:
+        export_metrics()
+        return
+    try:
+        with tenant.session_merge_lock:
+            log(f"🔍 All enqueued files finished{tenant_label(tenant)}, checking for session merge")
+            with metrics.span('session_merge'):
+                merge_session_files(tenant)
+    finally:
+        with outstanding_cond:
+            tenant.merges_running -= 1
+            outstanding_cond.notify_all()
+        export_metrics()
+
+def pipeline_status():
+    """Queue depths and in-flight counts right now"""
+    with intake_cond:
+        settling = len(intake_pending)
+    with session_lock:
+        in_flight = len(pending_files)
+    return {
+        'intake_settling': settling,
+        'file_queue_depth': file_queue.qsize(),
+        'preprocessing_queue_depth': preprocessing_queue.qsize(),
+        'files_in_flight': in_flight,
+        'files_outstanding': sum(tenant.outstanding for tenant in all_tenants()),
+        'memory_reserved_bytes': memory_budget.reserved if memory_budget else 0,
+    }
+
+def export_metrics():
+    """Rewrite METRICS_EXPORT_PATH with the current totals, if it's set"""
+    if METRICS_EXPORT_PATH:
+        try:
+            metrics.write_prometheus(METRICS_EXPORT_PATH, pipeline_status())
+        except OSError as e:
+            log(f"⚠️ Could not write metrics to {METRICS_EXPORT_PATH}: {e}")
+
+def wait_until_idle(timeout=None):
+    """Block until every enqueued file has finished and been merged; False on timeout"""
+    with outstanding_cond:
+        return outstanding_cond.wait_for(
+            lambda: all(tenant.outstanding == 0 and tenant.merges_running == 0 for tenant in all_tenants()),
+            timeout)
 
 def process_queue():
     while True:
         file_path = file_queue.get()
+        record_queue_wait('queue_wait', file_path)
+        queued = False
         if file_path in processed_files:
             log(f"⚠️ Skipping already processed file: {file_path}")
         else:
+            reserve_memory(file_path)
             log(f"🌀 Starting normalization for: {file_path}")
             try:
-                detect_header_and_normalize(file_path)
+                cache_key, df = lookup_cached_result(file_path)
+                if df is not None:
+                    log(f"💾 Cache hit for {os.path.basename(file_path)}")
+                    with session_lock:
+                        tenant_of(file_path).files.add(file_path)
+                    accept_cleaned_file(file_path, df, cache_key, cache_hit=True)
+                else:
+                    queued = detect_header_and_normalize(file_path, cache_key)
             except Exception as e:
                 log(f"❌ Error processing file: {file_path} — {e}")
+                metrics.incr('files_failed')
+                journal_event('file_failed', file_path, e)
         file_queue.task_done()
 
+        # Files handed to the filter stage are finished (and released) there
+        if not queued:
+            release_memory(file_path)
+            file_finished(file_path)
+
 def process_queue_and_filter():
     while True:
-        if preprocessing_queue.empty():
-            time.sleep(1)
-            continue
-        file_path = preprocessing_queue.get()
+        file_path, df, cache_key = preprocessing_queue.get()
+        record_queue_wait('filter_queue_wait', file_path)
         log(f"🧼 Cleaning started for: {file_path}")
         try:
-            df = pd.read_excel(file_path)
-            cleaned_df = apply_combined_filters(df)
-            cleaned_df.to_excel(file_path, index=False)
-            log(f"✅ Cleaned (overwritten): {file_path}")
+            cleaned_df = filter_file(file_path, df)
+            if cache_key:
+                store_cached_result(cache_key, cleaned_df)
+            accept_cleaned_file(file_path, cleaned_df, cache_key)
+            if PERSIST_INTERMEDIATES:
+                output_path = normalized_path(file_path)
+                writers.write_frame(output_path, cleaned_df, INTERMEDIATE_FORMAT)
+                log(f"✅ Cleaned (overwritten): {output_path}")
+            else:
+                log(f"✅ Cleaned: {file_path} (shape: {cleaned_df.shape})")
         except Exception as e:
             log(f"❌ Error cleaning {file_path}: {e}")
+            metrics.incr('files_failed')
+            journal_event('file_failed', file_path, e)
         preprocessing_queue.task_done()
+        release_memory(file_path)
+        file_finished(file_path)
+
+def _init_pool_worker(config):
+    """Runs once in every worker process: fresh log buffer and parent's settings"""
+    global log_queue
+    log_queue = queue.Queue()
+    globals().update(config)
+    configure_tenants()  # rule_db_paths() needs the parent's folders
+
+def _drain_worker_logs():
+    messages = []
+    try:
+        while True:
+            messages.append(log_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return messages
+
+def normalize_and_filter(file_path, submitted_at=None, profile_state=None, sheet_processes=None):
+    """Worker entry point: normalize + clean one file in a pool process.
+
+    Log messages and metrics events are returned for the parent to replay,
+    along with the worker's own peak RSS. profile_state is the parent's profiling.state(), so the GUI toggle
+    reaches workers that are already running. sheet_processes is what
+    idle_sheet_processes() granted this file.
+    """
+    global sheet_process_grant
+    sheet_process_grant = sheet_processes
+    if profile_state is not None and profile_state[0] != profiling.enabled:
+        profiling.set_enabled(*profile_state)
+    if submitted_at is not None:
+        metrics.record_span('pool_wait', file_path, max(time.time() - submitted_at, 0.0))
+    try:
+        df, cache_key, cache_hit = process_file_cached(file_path)
+        if df is not None and PERSIST_INTERMEDIATES:
+            writers.write_frame(normalized_path(file_path), df, INTERMEDIATE_FORMAT)
+        return (df, _drain_worker_logs(), None, cache_key, cache_hit, metrics.drain_events(),
+                memory.peak_rss(include_children=True))
+    except Exception as e:
+        return (None, _drain_worker_logs(), str(e), None, False, metrics.drain_events(),
+                memory.peak_rss(include_children=True))
+
+def _worker_config():
+    return {
+        'LOG_TO_CONSOLE': LOG_TO_CONSOLE,
+        'DB_PATH': DB_PATH,
+        'TABLE_NAME': TABLE_NAME,
+        'FILTER_DB_PATH': FILTER_DB_PATH,
+        'PROCESSING_CACHE': PROCESSING_CACHE,
+        'CACHE_DIR': os.path.abspath(CACHE_DIR),
+        'CACHE_MAX_BYTES': CACHE_MAX_BYTES,
+        'PERSIST_INTERMEDIATES': PERSIST_INTERMEDIATES,
+        'INTERMEDIATE_FORMAT': INTERMEDIATE_FORMAT,
+        'HEADER_SCAN_ROWS': HEADER_SCAN_ROWS,
+        'HEADER_MATCH_RATIO': HEADER_MATCH_RATIO,
+        'HEADER_FUZZY_THRESHOLD': HEADER_FUZZY_THRESHOLD,
+        'FUZZY_NAME_THRESHOLD': FUZZY_NAME_THRESHOLD,
+        'READ_CHUNK_SIZE': READ_CHUNK_SIZE,
+        'READER_ENGINE': READER_ENGINE,
+        'SHEET_PROCESSES': SHEET_PROCESSES,
+        'SHEET_PARALLEL_MIN_BYTES': SHEET_PARALLEL_MIN_BYTES,
+        'COLUMN_PROJECTION': COLUMN_PROJECTION,
+        'WATCH_FOLDERS': WATCH_FOLDERS,
+        'TENANT_QUOTA': TENANT_QUOTA,
+        'OPTIMIZE_DTYPES': OPTIMIZE_DTYPES,
+        'CATEGORY_MAX_RATIO': CATEGORY_MAX_RATIO,
+    }
+
+def start_worker_pool():
+    global worker_pool, in_flight_slots
+    if worker_pool is None:
+        worker_pool = ProcessPoolExecutor(
+            max_workers=WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_pool_worker,
+            initargs=(_worker_config(),),
+        )
+        in_flight_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT or WORKER_PROCESSES * 2)
+        log(f"🧵 Worker pool started with {WORKER_PROCESSES} processes")
 
-        # Check if all queues are empty and merge session files
-        if file_queue.empty() and preprocessing_queue.empty():
-            log("🔍 Queues empty, checking for session merge")
-            merge_session_files()
+def stop_worker_pool():
+    global worker_pool
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False, cancel_futures=True)
+        worker_pool = None
+        log("🧵 Worker pool stopped.")
+
+def _on_pool_result(file_path, future, slots):
+    """Done-callback, run on the executor's manager thread: free the slot and
+    hand the future over, so that thread goes straight back to collecting"""
+    slots.release()
+    tenant = tenant_of(file_path)
+    with session_lock:
+        results = completed_queues.get(tenant)
+        if results is None:
+            results = completed_queues[tenant] = Queue()
+            threading.Thread(target=collect_results, args=(results,), daemon=True).start()
+    results.put((file_path, future))
+
+def collect_results(results):
+    """One tenant's collector: accept its finished files and run its merges"""
+    while True:
+        file_path, future = results.get()
+        _on_file_done(file_path, future)
+
+def _on_file_done(file_path, future):
+    try:
+        if future.cancelled():
+            log(f"🚫 Cancelled: {file_path}")
+            return
+        df, messages, error, cache_key, cache_hit, events, rss = future.result()
+        note_worker_rss(rss)
+        for msg in messages:
+            log_queue.put(msg)
+        for event in events:
+            metrics.emit(event)
+        if error:
+            log(f"❌ Error processing file: {file_path} — {error}")
+            metrics.incr('files_failed')
+            journal_event('file_failed', file_path, error)
+        elif df is not None:
+            accept_cleaned_file(file_path, df, cache_key, cache_hit)
+            log(f"✅ Cleaned: {file_path} (shape: {df.shape})")
+        else:
+            journal_event('file_skipped', file_path, 'no supplier mapping or no readable data')
+    except Exception as e:
+        log(f"❌ Worker failed for {file_path}: {e}")
+        metrics.incr('files_failed')
+        journal_event('file_failed', file_path, e)
+    finally:
+        with session_lock:
+            pending_files.discard(file_path)
+        release_memory(file_path)
+        file_finished(file_path)
+
+def dispatch_to_pool():
+    """Feed file_queue into the worker pool, at most MAX_IN_FLIGHT files at a time"""
+    while True:
+        file_path = file_queue.get()
+        record_queue_wait('queue_wait', file_path)
+        try:
+            with session_lock:
+                already_running = file_path in pending_files
+            if file_path in processed_files or already_running:
+                log(f"⚠️ Skipping already processed file: {file_path}")
+                file_finished(file_path)
+                continue
+            pool, slots = worker_pool, in_flight_slots
+            if pool is None:
+                log(f"⚠️ Worker pool not running, dropping: {file_path}")
+                file_finished(file_path)
+                continue
+
+            slots.acquire()
+            sheet_processes = idle_sheet_processes(file_path)
+            reserve_memory(file_path, sheet_processes)
+            with session_lock:
+                tenant_of(file_path).files.add(file_path)
+                pending_files.add(file_path)
+            log(f"🌀 Dispatching to worker pool: {file_path}")
+            try:
+                future = pool.submit(normalize_and_filter, file_path, time.time(), profiling.state(),
+                                     sheet_processes)
+            except Exception as e:
+                with session_lock:
+                    pending_files.discard(file_path)
+                slots.release()
+                release_memory(file_path)
+                log(f"❌ Could not dispatch {file_path}: {e}")
+                journal_event('file_failed', file_path, e)
+                file_finished(file_path)
+                continue
+            future.add_done_callback(lambda f, path=file_path, slots=slots: _on_pool_result(path, f, slots))
+        finally:
+            file_queue.task_done()
+
+def is_watched_workbook(path):
+    name = os.path.basename(path)
+    return (name.lower().endswith(readers.EXTENSIONS) and '_normalized' not in name
+            and not name.startswith('~$')  # Excel lock/owner files
+            # A tenant's output (by default <folder>/output.xlsx) sits in the watched folder
+            and not any(is_merge_output(path, merged_output_path(tenant)) for tenant in all_tenants()))
+
+def note_file_event(path):
+    """Start (or restart) the settle window for path; repeated events coalesce"""
+    with intake_cond:
+        intake_pending[path] = None
+        intake_seen_at.setdefault(path, time.perf_counter())
+        intake_cond.notify()
+
+def _file_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def _ready_to_read(path):
+    """The writer has let go: the file opens and, for .xlsx, its zip directory is complete"""
+    try:
+        with open(path, 'rb') as f:
+            if path.lower().endswith(('.xlsx', '.xlsm')):
+                return zipfile.is_zipfile(f)
+            return True
+    except OSError:
+        return False
+
+def intake_settler():
+    """Enqueue files once their size/mtime stay unchanged for INTAKE_SETTLE_SECONDS"""
+    while True:
+        with intake_cond:
+            while not intake_pending:
+                intake_cond.wait()
+            snapshot = dict(intake_pending)
+
+        now = time.monotonic()
+        ready = []
+        seen_at = {}
+        next_check = INTAKE_SETTLE_SECONDS
+        updates = {}
+        for path, state in snapshot.items():
+            try:
+                signature = _file_signature(path)
+            except OSError:
+                updates[path] = 'gone'
+                continue
+            if state is None or state[0] != signature:
+                updates[path] = (signature, now)
+                continue
+            waited = now - state[1]
+            if waited < INTAKE_SETTLE_SECONDS:
+                next_check = min(next_check, max(INTAKE_SETTLE_SECONDS - waited, 0.05))
+            elif _ready_to_read(path):
+                ready.append(path)
+            elif waited >= INTAKE_MAX_WAIT_SECONDS:
+                log(f"⚠️ Unchanged for {waited:.0f}s but still not readable, queueing anyway: {path}")
+                ready.append(path)
+            # else: settled but unreadable, look again in INTAKE_SETTLE_SECONDS
+
+        with intake_cond:
+            for path, update in updates.items():
+                if intake_pending.get(path, 'gone') == snapshot[path]:  # no newer event
+                    if update == 'gone':
+                        intake_pending.pop(path, None)
+                        intake_seen_at.pop(path, None)
+                    else:
+                        intake_pending[path] = update
+            for path in list(ready):
+                if path in intake_pending and intake_pending[path] == snapshot[path]:
+                    del intake_pending[path]
+                    seen_at[path] = intake_seen_at.pop(path, None)
+                else:
+                    ready.remove(path)
+
+        for path in ready:
+            log(f"📦 File settled, queueing: {path}")
+            if seen_at.get(path) is not None:
+                metrics.record_span('intake', path, time.perf_counter() - seen_at[path])
+            enqueue_file(path)
+
+        with intake_cond:
+            if intake_pending and not ready:
+                intake_cond.wait(timeout=next_check)
 
 class ExcelHandler(FileSystemEventHandler):
     def on_created(self, event):
-        if not event.is_directory and event.src_path.endswith('.xlsx') and '_normalized' not in event.src_path:
+        if not event.is_directory and is_watched_workbook(event.src_path):
             log(f"👀 Watcher saw file created: {event.src_path}")
-            file_queue.put(event.src_path)
+            note_file_event(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory and is_watched_workbook(event.src_path):
+            note_file_event(event.src_path)
+
+    def on_moved(self, event):
+        # Excel and many copy tools write a temp file, then rename it into place
+        if event.is_directory:
+            return
+        with intake_cond:
+            intake_pending.pop(event.src_path, None)
+            intake_seen_at.pop(event.src_path, None)
+        if is_watched_workbook(event.dest_path):
+            log(f"👀 Watcher saw file moved in: {event.dest_path}")
+            note_file_event(event.dest_path)
 
 def start_watcher():
+    """Watch WATCH_FOLDER, or every folder of WATCH_FOLDERS, into one shared pipeline"""
     global observer
-    if not os.path.exists(WATCH_FOLDER):
-        os.makedirs(WATCH_FOLDER)
-
+    watched = configure_tenants()
     observer = Observer()
     event_handler = ExcelHandler()
-    observer.schedule(event_handler, path=WATCH_FOLDER, recursive=False)
+    if watched:
+        for tenant in watched:
+            os.makedirs(tenant.path, exist_ok=True)
+            observer.schedule(event_handler, path=tenant.path, recursive=tenant.recursive)
+    else:
+        if not os.path.exists(WATCH_FOLDER):
+            os.makedirs(WATCH_FOLDER)
+        observer.schedule(event_handler, path=WATCH_FOLDER, recursive=False)
     observer.start()
 
-    threading.Thread(target=process_queue, daemon=True).start()
-    threading.Thread(target=process_queue_and_filter, daemon=True).start()
-    log(f"🚀 Watcher booted and monitoring folder: {WATCH_FOLDER}")
+    threading.Thread(target=intake_settler, daemon=True).start()
+    if WORKER_PROCESSES > 0:
+        start_worker_pool()
+        threading.Thread(target=dispatch_to_pool, daemon=True).start()
+    else:
+        threading.Thread(target=process_queue, daemon=True).start()
+        threading.Thread(target=process_queue_and_filter, daemon=True).start()
+    for tenant in watched:
+        quota = tenant_quota(tenant)
+        log(f"🚀 Watcher booted and monitoring folder: {tenant.path} [{tenant.name}"
+            + (", recursive" if tenant.recursive else "")
+            + (f", {quota} files at a time" if quota is not None else "") + "]")
+    if not watched:
+        log(f"🚀 Watcher booted and monitoring folder: {WATCH_FOLDER}")
+    threading.Thread(target=resume_jobs, daemon=True).start()
 
 def stop_watcher():
     global observer
@@ -407,20 +1957,51 @@ def stop_watcher():
         observer.join()
         observer = None
         log("🛑 Watcher stopped.")
+    stop_worker_pool()
 
 def clear_queue(q):
     with q.mutex:
-        q.queue.clear()
+        if isinstance(q, tenants.FairQueue):
+            items = q.take_all()
+        else:
+            items = list(q.queue)
+            q.queue.clear()
+        paths = [item[0] if isinstance(item, tuple) else item for item in items]
+        for path in paths:
+            queued_at.pop(path, None)
         q.all_tasks_done.notify_all()
+        q.not_full.notify_all()
         q.unfinished_tasks = 0
+    if q is preprocessing_queue:
+        for path in paths:
+            release_memory(path)
+            file_queue.done(path)
+    # Dropped pipeline items will never finish on their own
+    if paths and q in (file_queue, preprocessing_queue):
+        with outstanding_cond:
+            for path in paths:
+                tenant = tenant_of(path)
+                tenant.outstanding = max(tenant.outstanding - 1, 0)
+            outstanding_cond.notify_all()
 
 def clear_session():
-    """Clear current session files"""
-    with session_lock:
-        session_files.clear()
+    """Clear every tenant's current session files"""
+    for tenant in all_tenants():
+        with session_lock:
+            tenant.files.clear()
+            discard_session_frames(tenant.frames.values())
+            tenant.frames.clear()
+            tenant.frame_bytes = 0
+            tenant.keys.clear()
+            tenant.categories.clear()
+        with tenant.merge_lock:
+            if tenant.writer is not None:
+                tenant.writer.close()
+                tenant.writer = None
+            tenant.merged.clear()
     log("🗑️ Session cleared.")
 
 def get_session_files():
-    """Get current session files"""
+    """Get current session files (of every tenant)"""
     with session_lock:
-        return session_files.copy()
\ No newline at end of file
+        return set().union(*(tenant.files for tenant in all_tenants()))
\ No newline at end of file
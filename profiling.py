@@ -0,0 +1,140 @@
+"""Per-file hot-path profiling: cProfile + tracemalloc, off unless switched on.
+
+Functions decorated with hot_path(stage) run under cProfile and between two
+tracemalloc snapshots while profiling is enabled. Each call leaves
+<PROFILE_DIR>/<file>.<stage>.<time>.prof (open with pstats or snakeviz) and a
+.txt with the top TOP_N functions by cumulative time and the top allocation
+sites, and the same summary goes to the pipeline log. When disabled the
+wrapper is a single flag check.
+
+Enable with the GUI checkbox, batch_process.py --profile or the
+PIPELINE_PROFILE environment variable (any value but 0/false/no).
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+ENV_VAR = 'PIPELINE_PROFILE'
+PROFILE_DIR = 'profiles'
+TOP_N = 15
+
+enabled = os.environ.get(ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no')
+log = print  # processing_excel points this at its log queue
+_started_tracemalloc = False
+
+
+def set_enabled(flag, directory=None):
+    """Switch profiling on or off at runtime (tracemalloc only runs while on)"""
+    global enabled, PROFILE_DIR, _started_tracemalloc
+    if directory:
+        PROFILE_DIR = directory
+    enabled = bool(flag)
+    if not enabled and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def state():
+    """(enabled, absolute profile dir), to hand to worker processes"""
+    return enabled, os.path.abspath(PROFILE_DIR)
+
+
+def _artifact_base(stage, file_path):
+    name = os.path.basename(file_path) if file_path else 'session'
+    name = re.sub(r'[^\w.-]+', '_', name)
+    return os.path.join(PROFILE_DIR, f"{name}.{stage}.{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}.{os.getpid()}")
+
+
+def _top_functions(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP_N)
+    # Keep the table: drop pstats' header lines up to the column titles
+    text = out.getvalue()
+    start = text.find('   ncalls')
+    return text[start:].rstrip() if start >= 0 else text.rstrip()
+
+
+def _top_allocations(before, after):
+    if after is None:
+        return ''
+    stats = after.compare_to(before, 'lineno')
+    lines = [f"{stat.size_diff / 1024:+10.1f} KB {stat.count_diff:+8d} blocks  {stat.traceback}"
+             for stat in stats[:TOP_N] if stat.size_diff]
+    return '\n'.join(lines)
+
+
+@contextmanager
+def profile(stage, file_path=None):
+    """Profile the with-block as one stage of file_path and write the artifacts"""
+    global _started_tracemalloc
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler is active in this interpreter
+        profiler = None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        # set_enabled(False) from another thread may have stopped tracemalloc
+        tracing = tracemalloc.is_tracing()
+        after = tracemalloc.take_snapshot() if tracing else None
+        peak = tracemalloc.get_traced_memory()[1] if tracing else 0
+        _report(stage, file_path, elapsed, peak, profiler, before, after)
+
+
+def _report(stage, file_path, elapsed, peak, profiler, before, after):
+    label = os.path.basename(file_path) if file_path else 'session merge'
+    summary = [f"Profile of {stage} for {label}: {elapsed:.3f}s, traced peak {peak / 1024 ** 2:.1f} MB"]
+    if profiler is not None:
+        summary += ['', f"Top {TOP_N} functions by cumulative time:", _top_functions(profiler)]
+    else:
+        summary += ['', "cProfile unavailable (another profiler is active); allocations only"]
+    allocations = _top_allocations(before, after)
+    if allocations:
+        summary += ['', f"Top {TOP_N} allocation sites:", allocations]
+    text = '\n'.join(summary)
+
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = _artifact_base(stage, file_path)
+        if profiler is not None:
+            profiler.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        text += f"\n📁 Profile saved to: {base}.{'prof' if profiler is not None else 'txt'}"
+    except OSError as e:
+        text += f"\n⚠️ Could not save profile to {PROFILE_DIR}: {e}"
+    log(f"🔬 {text}")
+
+
+def hot_path(stage):
+    """Decorator: profile each call as stage while profiling is enabled.
+
+    The profiled file is the first positional argument when it's a path.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            file_path = args[0] if args and isinstance(args[0], str) else None
+            with profile(stage, file_path):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,239 @@
+"""Pluggable workbook readers for header detection and normalization.
+
+open_workbook() returns a reader whose .worksheets each have a title, a
+max_column (None when unknown) and iter_rows(), which yields one tuple of
+cell values per row with empty cells as None -- the same rows openpyxl's
+read-only mode produces. .xlsx/.xls go through calamine (Rust, pip install
+python-calamine) when it's installed and through openpyxl (or xlrd for .xls)
+otherwise; .csv is read with the csv module.
+"""
+import csv
+import datetime
+import os
+from openpyxl import load_workbook
+
+try:
+    from python_calamine import CalamineWorkbook, SheetTypeEnum
+except ImportError:  # calamine is optional, openpyxl is the fallback
+    CalamineWorkbook = None
+
+try:
+    import xlrd
+except ImportError:  # .xls without calamine needs xlrd
+    xlrd = None
+
+EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv')
+ENGINES = ('auto', 'calamine', 'openpyxl')
+
+CSV_ENCODING = 'utf-8-sig'
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ',;\t|'
+
+
+class ReaderUnavailable(Exception):
+    """No installed engine can read this file type"""
+
+
+class WorkbookReader:
+    """Base reader: a list of sheets and close()"""
+    engine = None
+
+    def __init__(self, path):
+        self.path = path
+        self.worksheets = []
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpenpyxlSheet:
+    def __init__(self, sheet):
+        self._sheet = sheet
+        self.title = sheet.title
+
+    @property
+    def max_column(self):
+        return self._sheet.max_column
+
+    def iter_rows(self):
+        return self._sheet.iter_rows(values_only=True)
+
+
+class OpenpyxlReader(WorkbookReader):
+    engine = 'openpyxl'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        self.worksheets = [OpenpyxlSheet(sheet) for sheet in self._workbook.worksheets]
+
+    def close(self):
+        self._workbook.close()
+
+
+def _calamine_row(row, pad):
+    """calamine values as openpyxl returns them: '' -> None, whole floats -> int"""
+    values = [None] * pad
+    for value in row:
+        cls = value.__class__
+        if cls is str:
+            values.append(value or None)
+        elif cls is float:
+            values.append(int(value) if value.is_integer() and abs(value) < 1e15 else value)
+        elif cls is datetime.date:
+            values.append(datetime.datetime.combine(value, datetime.time()))
+        else:
+            values.append(value)
+    return tuple(values)
+
+
+class CalamineSheet:
+    """A calamine sheet, loaded the first time it's looked at"""
+
+    def __init__(self, workbook, name):
+        self._workbook = workbook
+        self._sheet = None
+        self.title = name
+
+    def _load(self):
+        if self._sheet is None:
+            self._sheet = self._workbook.get_sheet_by_name(self.title)
+        return self._sheet
+
+    @property
+    def max_column(self):
+        end = self._load().end
+        return end[1] + 1 if end else 1  # openpyxl reports A1 for empty sheets
+
+    def iter_rows(self):
+        sheet = self._load()
+        # calamine starts rows at A1 but columns at the first used one
+        pad = sheet.start[1] if sheet.start else 0
+        for row in sheet.iter_rows():
+            yield _calamine_row(row, pad)
+
+
+class CalamineReader(WorkbookReader):
+    engine = 'calamine'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._workbook = CalamineWorkbook.from_path(path)
+        self.worksheets = [
+            CalamineSheet(self._workbook, meta.name) for meta in self._workbook.sheets_metadata
+            if meta.typ == SheetTypeEnum.WorkSheet
+        ]
+
+    def close(self):
+        self._workbook.close()
+
+
+class XlrdSheet:
+    def __init__(self, book, index):
+        self._book = book
+        self._index = index
+        self.title = book.sheet_names()[index]
+
+    @property
+    def max_column(self):
+        return self._book.sheet_by_index(self._index).ncols
+
+    def iter_rows(self):
+        sheet = self._book.sheet_by_index(self._index)
+        datemode = self._book.datemode
+        for r in range(sheet.nrows):
+            yield tuple(_xlrd_value(cell, datemode) for cell in sheet.row(r))
+
+
+def _xlrd_value(cell, datemode):
+    ctype, value = cell.ctype, cell.value
+    if ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if ctype == xlrd.XL_CELL_TEXT:
+        return value or None
+    if ctype == xlrd.XL_CELL_NUMBER:
+        return int(value) if value.is_integer() and abs(value) < 1e15 else value
+    if ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate_as_datetime(value, datemode)
+    if ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(value)
+    return xlrd.error_text_from_code.get(value)
+
+
+class XlrdReader(WorkbookReader):
+    engine = 'xlrd'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._book = xlrd.open_workbook(path, on_demand=True)
+        self.worksheets = [XlrdSheet(self._book, i) for i in range(self._book.nsheets)]
+
+    def close(self):
+        self._book.release_resources()
+
+
+class CsvSheet:
+    """The whole file as one sheet; rows keep their text, empty fields become None"""
+    max_column = None
+
+    def __init__(self, path):
+        self.path = path
+        self.title = os.path.splitext(os.path.basename(path))[0]
+
+    def iter_rows(self):
+        with open(self.path, newline='', encoding=CSV_ENCODING, errors='replace') as f:
+            sample = f.read(CSV_SNIFF_BYTES)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+            except csv.Error:
+                dialect = csv.excel
+            for row in csv.reader(f, dialect):
+                yield tuple(value or None for value in row)
+
+
+class CsvReader(WorkbookReader):
+    engine = 'csv'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.worksheets = [CsvSheet(path)]
+
+
+def calamine_available():
+    return CalamineWorkbook is not None
+
+
+def open_workbook(path, engine='auto'):
+    """Reader for path; engine picks calamine or openpyxl for Excel files.
+
+    'auto' uses calamine when it's installed and falls back to openpyxl/xlrd
+    if calamine can't open the file.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown reader engine: {engine} (choose from {', '.join(ENGINES)})")
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CsvReader(path)
+
+    if engine != 'openpyxl':
+        if CalamineWorkbook is not None:
+            try:
+                return CalamineReader(path)
+            except Exception:
+                if engine == 'calamine':
+                    raise
+        elif engine == 'calamine':
+            raise ReaderUnavailable("the calamine engine needs python-calamine (pip install python-calamine)")
+
+    if ext == '.xls':
+        if xlrd is None:
+            raise ReaderUnavailable(".xls files need python-calamine or xlrd")
+        return XlrdReader(path)
+    return OpenpyxlReader(path)
@@ -0,0 +1,144 @@
+"""Watched folders as tenants: per-folder merge sessions and a fair file queue.
+
+Every watched folder (tenant) keeps its own session, merge output and rule
+databases, while all of them share one process, one worker pool and one rule
+cache. FairQueue hands queued files out round-robin between tenants and
+holds a tenant back once `quota` of its files are in flight, so a 500-file
+dump in one folder delays another folder's drop by at most one file per
+busy tenant instead of the whole dump.
+"""
+import collections
+import os
+import queue
+import threading
+
+
+class Tenant:
+    """One watched folder: where it is, where it merges to and its session"""
+
+    def __init__(self, name, path=None, output=None, recursive=False, db_path=None,
+                 filter_db_path=None, quota=None):
+        self.name = name
+        self.path = os.path.normcase(os.path.abspath(path)) if path else None
+        self.output = output  # None = MERGED_OUTPUT_PATH
+        self.recursive = recursive
+        self.db_path = db_path  # None = DB_PATH
+        self.filter_db_path = filter_db_path  # None = FILTER_DB_PATH
+        self.quota = quota  # Files in flight at once; None = TENANT_QUOTA
+
+        # Merge session
+        self.files = set()  # Files processed in the current session
+        self.frames = {}  # Batch mode: cleaned dataframes waiting for the merge
+        self.frame_bytes = 0  # ... of which this many bytes are held in memory
+        self.keys = {}  # cache key -> file already merged this session
+        self.categories = {}  # column -> categories seen this session
+        self.writer = None  # Incremental mode: open RollingWriter
+        self.merged = []  # Paths appended to writer so far
+        self.merge_lock = threading.Lock()
+        self.session_merge_lock = threading.Lock()  # One session merge at a time
+        self.last_merge = {'paths': [], 'files': [], 'rows': 0}
+
+        # Files enqueued but not yet finished; the merge fires when this drops to 0
+        self.outstanding = 0
+        self.merges_running = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Tenant from a WATCH_FOLDERS entry ({'path': ..., 'name': ..., ...})"""
+        path = config['path']
+        name = config.get('name') or os.path.basename(os.path.normpath(path))
+        return cls(name, path, config.get('output'), config.get('recursive', False),
+                   config.get('db_path'), config.get('filter_db_path'), config.get('quota'))
+
+    def contains(self, path):
+        """True when path is in this tenant's folder (or below it, when recursive)"""
+        if self.path is None:
+            return False
+        folder = os.path.dirname(os.path.normcase(os.path.abspath(path)))
+        if folder == self.path:
+            return True
+        return self.recursive and folder.startswith(self.path.rstrip(os.sep) + os.sep)
+
+
+class FairQueue(queue.Queue):
+    """FIFO per tenant, round-robin between tenants, quota-limited hand-out.
+
+    key(item) is an item's tenant (any hashable) and quota(tenant) caps how
+    many of its items may be handed out at once (None = no cap). A handed-out item counts
+    against its tenant until done(item) is called. maxsize and qsize() count
+    every waiting item, as with queue.Queue.
+    """
+
+    def __init__(self, maxsize=0, key=None, quota=None):
+        self.key = key or (lambda item: None)
+        self.quota = quota or (lambda tenant: None)
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.tenant_items = collections.OrderedDict()  # tenant -> deque, least recently served first
+        self.in_flight = collections.Counter()
+        self.handed_out = {}  # item -> [tenant, ...] until done(item)
+        self.size = 0
+
+    def _qsize(self):
+        return self.size
+
+    def _put(self, item):
+        self.tenant_items.setdefault(self.key(item), collections.deque()).append(item)
+        self.size += 1
+
+    def _next_tenant(self):
+        for tenant, items in self.tenant_items.items():
+            limit = self.quota(tenant)
+            if items and (limit is None or self.in_flight[tenant] < limit):
+                return tenant
+        return None
+
+    def _get(self):
+        tenant = self._next_tenant()
+        items = self.tenant_items[tenant]
+        item = items.popleft()
+        if items:
+            self.tenant_items.move_to_end(tenant)
+        else:
+            del self.tenant_items[tenant]
+        self.size -= 1
+        self.in_flight[tenant] += 1
+        self.handed_out.setdefault(item, []).append(tenant)
+        return item
+
+    def get(self, block=True, timeout=None):
+        """Like Queue.get, but waits for an item whose tenant is under its quota"""
+        with self.not_empty:
+            ready = lambda: self._next_tenant() is not None
+            if not self.not_empty.wait_for(ready, timeout if block else 0):
+                raise queue.Empty
+            item = self._get()
+            self.not_full.notify()
+            return item
+
+    def done(self, item):
+        """item left the pipeline: its tenant may have another one handed out"""
+        with self.mutex:
+            handed_to = self.handed_out.get(item)
+            if not handed_to:
+                return
+            tenant = handed_to.pop()
+            if not handed_to:
+                del self.handed_out[item]
+            self.in_flight[tenant] -= 1
+            if self.in_flight[tenant] <= 0:
+                del self.in_flight[tenant]
+            self.not_empty.notify_all()
+
+    def take_all(self):
+        """Remove and return every waiting item; the caller holds self.mutex"""
+        items = [item for tenant_items in self.tenant_items.values() for item in tenant_items]
+        self.tenant_items.clear()
+        self.size = 0
+        return items
+
+    def depths(self):
+        """{tenant: items waiting}"""
+        with self.mutex:
+            return {tenant: len(items) for tenant, items in self.tenant_items.items()}
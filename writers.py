@@ -0,0 +1,356 @@
+"""Pluggable writers for merged output and normalized intermediates.
+
+Every writer is opened once, fed one DataFrame per file with write(), and
+finished with close(). csv, parquet and feather append to disk as they go;
+xlsx streams rows through openpyxl's write-only mode and is meant for final
+exports only. RollingWriter wraps any of them for incremental session
+merges whose schema can grow.
+"""
+import os
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:  # parquet/feather output is optional
+    pa = None
+
+EXTENSIONS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+PARQUET_COMPRESSION = 'zstd'
+RECONCILE_CHUNK_ROWS = 100_000  # csv rows per chunk while reconciling parts
+
+
+def output_path_for(path, fmt):
+    """Swap the extension of path for the one matching fmt"""
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def _require_pyarrow(fmt):
+    if pa is None:
+        raise RuntimeError(f"pyarrow is required for {fmt} output (pip install pyarrow)")
+
+
+class SchemaChanged(Exception):
+    """A frame doesn't fit the columns/types an open writer was started with"""
+
+
+def _to_arrow_table(df, schema=None):
+    """Object columns become strings so mixed-type Excel columns serialize cleanly.
+
+    Categoricals are written as their values: per-file category lists would
+    otherwise give every frame a different dictionary type.
+    """
+    df = df.copy()
+    for pos, dtype in enumerate(df.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype):
+            df.isetitem(pos, df.iloc[:, pos].astype(dtype.categories.dtype))
+        if df.dtypes.iloc[pos] == object:
+            df.isetitem(pos, df.iloc[:, pos].astype('string'))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None and not table.schema.equals(schema):
+        try:
+            table = table.cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise SchemaChanged(str(e)) from e
+    return table
+
+
+class FrameWriter:
+    """Base writer: fixes the column order and counts rows written"""
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = list(columns) if columns is not None else None
+        self.rows_written = 0
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        else:
+            new_columns = [col for col in df.columns if col not in self.columns]
+            if new_columns:
+                raise SchemaChanged(f"new columns: {new_columns}")
+            df = df.reindex(columns=self.columns)
+        self._write(df)
+        self.rows_written += len(df)
+
+    def _write(self, df):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvWriter(FrameWriter):
+    def __init__(self, path, columns=None):
+        super().__init__(path, columns)
+        self._started = False
+
+    def _write(self, df):
+        df.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False)
+        self._started = True
+
+
+class ParquetWriter(FrameWriter):
+    def __init__(self, path, columns=None, compression=None):
+        _require_pyarrow('parquet')
+        super().__init__(path, columns)
+        self.compression = compression or PARQUET_COMPRESSION
+        self.schema = None
+        self._writer = None
+
+    def _write(self, df):
+        table = _to_arrow_table(df, self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class FeatherWriter(FrameWriter):
+    """Arrow IPC file format, one record batch group per write()"""
+
+    def __init__(self, path, columns=None):
+        _require_pyarrow('feather')
+        super().__init__(path, columns)
+        self.schema = None
+        self._sink = None
+        self._writer = None
+
+    def _write(self, df):
+        table = _to_arrow_table(df, self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            self._sink = pa.OSFile(self.path, 'wb')
+            self._writer = ipc.new_file(self._sink, self.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
+
+
+class ExcelWriter(FrameWriter):
+    """openpyxl write-only workbook: rows are streamed, not kept as cells"""
+
+    def __init__(self, path, columns=None):
+        super().__init__(path, columns)
+        self._workbook = None
+        self._sheet = None
+
+    def _write(self, df):
+        if self._workbook is None:
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+            self._sheet.append([str(col) for col in self.columns])
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            self._sheet.append(row)
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.save(self.path)
+            self._workbook = None
+            self._sheet = None
+
+
+WRITERS = {
+    'xlsx': ExcelWriter,
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+    'feather': FeatherWriter,
+}
+
+
+def open_writer(path, fmt=None, columns=None):
+    """Writer for fmt (or for path's extension when fmt is None)"""
+    if fmt is None:
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported output format: {fmt} (choose from {', '.join(WRITERS)})")
+    return WRITERS[fmt](path, columns=columns)
+
+
+class RollingWriter:
+    """Append frames to path as they arrive, for incremental session merges.
+
+    Columns missing from a frame are written as nulls. When a frame brings
+    new columns (or types the open file can't hold), the current file is
+    closed and the session continues in path-<n>.<ext> with the widened
+    column list, so nothing already written is touched mid-session. close()
+    then reconciles the parts back into path: new columns null-filled,
+    conflicting types promoted (int -> float) or widened to string. Only if
+    that fails are the parts left as they are; parts lists them and
+    reconcile_error says why.
+    """
+
+    def __init__(self, path, fmt=None, columns=None):
+        self.path = path
+        self.fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        self.columns = list(columns) if columns is not None else []
+        self.parts = []
+        self.rows_written = 0
+        self.reconcile_error = None
+        self._writer = None
+
+    def _part_path(self):
+        if not self.parts:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        return f"{base}-{len(self.parts)}{ext}"
+
+    def _open_part(self):
+        path = self._part_path()
+        self._writer = open_writer(path, self.fmt, columns=self.columns)
+        self.parts.append(path)
+
+    def write(self, df):
+        """Returns True when this frame started a new part file"""
+        rolled = False
+        new_columns = [col for col in df.columns if col not in self.columns]
+        self.columns.extend(new_columns)
+        if self._writer is None:
+            self._open_part()
+        try:
+            self._writer.write(df)
+        except SchemaChanged:
+            self._writer.close()
+            self._open_part()
+            self._writer.write(df)
+            rolled = True
+        self.rows_written += len(df)
+        return rolled
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if len(self.parts) > 1:
+            self._reconcile()
+
+    def _reconcile(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            RECONCILERS[self.fmt](self.parts, self.columns, tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.reconcile_error = e
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        for part in self.parts[1:]:
+            os.remove(part)
+        self.parts = [self.path]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _common_type(types):
+    """One Arrow type every part's column casts to: shared, numeric-promoted or string"""
+    types = [t for t in types if not pa.types.is_null(t)]
+    if not types:
+        return pa.null()
+    if all(t == types[0] for t in types):
+        return types[0]
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_batches(path, fmt):
+    """(schema, record batch iterator) of a parquet/feather part"""
+    if fmt == 'parquet':
+        part = pq.ParquetFile(path)
+        return part.schema_arrow, part.iter_batches()
+    reader = ipc.open_file(pa.memory_map(path))
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def _reconcile_arrow(fmt, paths, columns, out_path):
+    schemas = [_arrow_batches(path, fmt)[0] for path in paths]
+    schema = pa.schema([
+        pa.field(col, _common_type([s.field(col).type for s in schemas if col in s.names]))
+        for col in columns])
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(out_path, schema, compression=PARQUET_COMPRESSION)
+        sink = None
+    else:
+        sink = pa.OSFile(out_path, 'wb')
+        writer = ipc.new_file(sink, schema)
+    try:
+        for path in paths:
+            for batch in _arrow_batches(path, fmt)[1]:
+                arrays = [batch.column(col).cast(field.type, safe=False) if col in batch.schema.names
+                          else pa.nulls(batch.num_rows, field.type)
+                          for col, field in zip(columns, schema)]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+
+
+def _reconcile_csv(paths, columns, out_path):
+    pd.DataFrame(columns=columns).to_csv(out_path, index=False)
+    for path in paths:
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=RECONCILE_CHUNK_ROWS):
+            chunk.reindex(columns=columns, fill_value='').to_csv(out_path, mode='a', header=False, index=False)
+
+
+def _reconcile_xlsx(paths, columns, out_path):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = [str(col) for col in columns]
+    sheet.append(header)
+    for path in paths:
+        part = load_workbook(path, read_only=True)
+        try:
+            rows = part.active.iter_rows(values_only=True)
+            part_header = [str(value) for value in next(rows, ())]
+            index = [part_header.index(col) if col in part_header else None for col in header]
+            for row in rows:
+                sheet.append([row[i] if i is not None and i < len(row) else None for i in index])
+        finally:
+            part.close()
+    workbook.save(out_path)
+
+
+RECONCILERS = {
+    'xlsx': _reconcile_xlsx,
+    'csv': _reconcile_csv,
+    'parquet': lambda paths, columns, out_path: _reconcile_arrow('parquet', paths, columns, out_path),
+    'feather': lambda paths, columns, out_path: _reconcile_arrow('feather', paths, columns, out_path),
+}
+
+
+def write_frame(path, df, fmt=None):
+    """One-shot write of a single DataFrame"""
+    with open_writer(path, fmt) as writer:
+        writer.write(df)